@@ -0,0 +1,235 @@
+import threading
+from collections import OrderedDict
+
+import networkx as nx
+import numpy as np
+
+from routing import astar_targets, weight_function
+
+
+class LandmarkIndex:
+    """
+    ALT (A*, landmarks, triangle inequality) preprocessing for repeated routing queries.
+
+    A handful of landmarks is chosen by farthest-point selection and the distance from each
+    landmark to every node is stored in a (landmarks x nodes) array. For any nodes u and t,
+    |d(L, u) - d(L, t)| <= d(u, t), and the largest of these bounds over all landmarks is a
+    consistent A* heuristic.
+
+    The bounds stay admissible as long as no edge is cheaper than when they were computed,
+    so customize() keeps the index valid after weight changes: weight increases only loosen
+    the bounds and cost nothing, and a weight decrease re-runs only the landmarks whose
+    distances it can shorten.
+
+    Landmarks only pay off for searches that would otherwise cover much of the graph: a query
+    that may stop after a few of a few targets. With k=None nothing can be pruned, and with many
+    targets the nearest one is close enough that plain Dijkstra over the CSR arrays finishes
+    before the bounds are even computed (see bench_routing.py). helps() tells callers which
+    queries to send here.
+    """
+
+    def __init__(self, graph, landmarks=8, weight='base_travel_time', max_k=4, max_targets=16, cached_target_sets=8):
+        self.graph = graph
+        self.num_landmarks = landmarks
+        self.max_k = max_k
+        self.max_targets = max_targets
+        self.cached_target_sets = cached_target_sets
+        self.landmarks = []
+        self.nodes = []
+        self.node_index = {}
+        self.distances = np.empty((0, 0))
+        self.version = None
+        self._csr_rows = None
+        self._sorted = None
+        self._bounds_for = None
+        self._bounds_cache = OrderedDict()
+        self._weights = {}
+        self._lock = threading.Lock()
+        self.build(weight)
+
+    def build(self, weight='base_travel_time'):
+        """
+        Select landmarks and compute their distance arrays from scratch.
+        """
+        get_weight = weight_function(weight)
+        self.nodes = list(self.graph.nodes)
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        self._weights = self._edge_weights(get_weight)
+        landmarks = []
+        rows = []
+        # Start from the node farthest from an arbitrary one, then keep adding the node
+        # farthest from all landmarks chosen so far; unreachable nodes are picked first
+        # so every connected component gets a landmark.
+        if self.nodes:
+            nearest = self._landmark_row(self.nodes[0])
+        while len(landmarks) < min(self.num_landmarks, len(self.nodes)):
+            candidates = nearest.copy()
+            candidates[[self.node_index[chosen] for chosen in landmarks]] = -1
+            landmark = self.nodes[int(np.argmax(candidates))]
+            row = self._landmark_row(landmark)
+            landmarks.append(landmark)
+            rows.append(row)
+            nearest = row if len(rows) == 1 else np.minimum(nearest, row)
+        self.landmarks = landmarks
+        self.distances = np.vstack(rows) if rows else np.empty((0, len(self.nodes)))
+
+    def customize(self, weight='weight', version=None):
+        """
+        Bring the index in line with the current edge weights.
+
+        version lets callers that publish numbered weight snapshots skip the check when nothing
+        changed. Rows are recomputed into a copy that is swapped in at the end, so concurrent
+        queries keep reading a consistent array. Returns the number of landmarks recomputed.
+        """
+        with self._lock:
+            if version is not None and version == self.version:
+                return 0
+            self.version = version
+            return self._customize(weight_function(weight))
+
+    def _customize(self, get_weight):
+        if set(self.graph.nodes) != set(self.node_index):
+            self.build(get_weight)
+            return len(self.landmarks)
+
+        current = self._edge_weights(get_weight)
+        decreased = [
+            (self.node_index[u], self.node_index[v], w) for (u, v), w in current.items()
+            if w < self._weights.get((u, v), float('-inf'))
+        ]
+        added = [(u, v) for u, v in current if (u, v) not in self._weights]
+        if added:
+            # A new edge behaves like a decrease from infinity
+            decreased += [(self.node_index[u], self.node_index[v], current[(u, v)]) for u, v in added]
+        self._weights = current
+        if not decreased:
+            return 0
+
+        # A landmark's distances can only shrink if a cheaper edge now relaxes one of its labels
+        u_idx, v_idx, w = (np.array(column) for column in zip(*decreased))
+        du, dv = self.distances[:, u_idx], self.distances[:, v_idx]
+        affected = np.flatnonzero(((du + w < dv) | (dv + w < du)).any(axis=1))
+        distances = self.distances.copy()
+        for i in affected:
+            distances[i] = self._landmark_row(self.landmarks[i], get_weight)
+        self.distances = distances
+        return len(affected)
+
+    def bounds(self, targets):
+        """
+        Lower bound on the distance from every node (a list in node_index order) to the nearest target.
+
+        For each landmark L, the gap between d(L, node) and the closest d(L, t) over the targets
+        bounds the distance to every target, and it changes by at most an edge weight along an
+        edge, so the largest gap over the landmarks is consistent. It is never larger than the
+        per-target bound min_t max_L |d(L, node) - d(L, t)|, but needs only one merge of the
+        sorted target distances into each landmark's presorted node distances. The result is
+        kept for the last few target sets, since the same eligible banks come up again and again.
+        """
+        distances = self.distances
+        columns = frozenset(self.node_index[target] for target in targets if target in self.node_index)
+        with self._lock:
+            if self._bounds_for is not distances:
+                self._bounds_for = distances
+                self._bounds_cache.clear()
+            cached = self._bounds_cache.get(columns)
+            if cached is not None:
+                self._bounds_cache.move_to_end(columns)
+                return cached
+
+        bounds = np.zeros(len(self.nodes))
+        if columns and len(distances) and len(self.nodes):
+            order, sorted_rows = self._sorted_rows(distances)
+            target_rows = distances[:, sorted(columns)]
+            gaps = np.empty(len(self.nodes))
+            with np.errstate(invalid='ignore'):
+                for target_row, node_order, row in zip(target_rows, order, sorted_rows):
+                    values = np.sort(target_row[np.isfinite(target_row)])
+                    if len(values):
+                        padded = np.concatenate(([-np.inf], values, [np.inf]))
+                        position = np.searchsorted(values, row) + 1
+                        gaps[node_order] = np.minimum(padded[position] - row, row - padded[position - 1])
+                    else:
+                        gaps[:] = np.inf
+                    # A landmark that reaches neither the node nor some target says nothing about their distance
+                    unreachable = not np.isfinite(target_row).all()
+                    gaps[node_order[np.isinf(row)]] = 0.0 if unreachable else np.inf
+                    np.maximum(bounds, gaps, out=bounds)
+        bounds = bounds.tolist()
+
+        with self._lock:
+            if self._bounds_for is distances:
+                self._bounds_cache[columns] = bounds
+                if len(self._bounds_cache) > self.cached_target_sets:
+                    self._bounds_cache.popitem(last=False)
+        return bounds
+
+    def heuristic(self, targets):
+        """
+        Return a consistent heuristic giving a lower bound on the distance to the nearest target.
+        """
+        bounds = self.bounds(targets)
+        node_index = self.node_index
+
+        def lower_bound(node):
+            i = node_index.get(node)
+            return 0 if i is None else bounds[i]
+
+        return lower_bound
+
+    def helps(self, k, num_targets):
+        """
+        Whether a query for the k nearest of num_targets targets is worth running with landmarks.
+        """
+        return k is not None and k <= self.max_k and num_targets <= self.max_targets
+
+    def nearest_targets(self, source, targets, k=None, weight='weight', csr_graph=None):
+        """
+        Landmark-guided equivalent of routing.nearest_targets. With a CSRGraph of the same graph
+        the A* search runs over its arrays and current weights instead of the networkx graph.
+        """
+        targets = list(targets)
+        if csr_graph is None:
+            return astar_targets(self.graph, source, targets, self.heuristic(targets), k=k, weight=weight)
+        bounds = self.bounds(targets)
+        order = self._csr_order(csr_graph)
+        if order is not None:
+            bounds = [bounds[i] if i >= 0 else 0.0 for i in order.tolist()]
+        return csr_graph.nearest_targets(source, targets, k=k, heuristic=bounds.__getitem__)
+
+    def _sorted_rows(self, distances):
+        # Each landmark's node order by distance, computed once per distance array
+        cached = self._sorted
+        if cached is None or cached[0] is not distances:
+            order = np.argsort(distances, axis=1, kind='stable')
+            cached = (distances, order, np.take_along_axis(distances, order, axis=1))
+            self._sorted = cached
+        return cached[1], cached[2]
+
+    def _csr_order(self, csr_graph):
+        # Index row of every CSR node id, or None when both number the nodes the same way
+        cached = self._csr_rows
+        if cached is None or cached[0] is not csr_graph or cached[1] is not self.nodes:
+            if csr_graph.names == self.nodes:
+                order = None
+            else:
+                order = np.array([self.node_index.get(name, -1) for name in csr_graph.names], dtype=np.int64)
+            cached = (csr_graph, self.nodes, order)
+            self._csr_rows = cached
+        return cached[2]
+
+    def _edge_weights(self, get_weight):
+        weights = {}
+        for u, v, data in self.graph.edges(data=True):
+            weights[(u, v)] = get_weight(u, v, data)
+        return weights
+
+    def _landmark_row(self, landmark, get_weight=None):
+        if get_weight is None:
+            weights = self._weights
+            get_weight = lambda u, v, data: weights.get((u, v), weights.get((v, u)))
+        lengths = nx.single_source_dijkstra_path_length(self.graph, landmark, weight=get_weight)
+        row = np.full(len(self.nodes), np.inf)
+        for node, length in lengths.items():
+            row[self.node_index[node]] = length
+        return row
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+
+import aiohttp
+
+ORS_DIRECTIONS_URL = "https://api.openrouteservice.org/v2/directions/driving-car"
+
+
+class AsyncIngestPipeline:
+    """
+    asyncio pipeline that fetches locations, fetches road distances and builds the graph.
+
+    All HTTP traffic goes through one aiohttp session whose connector caps the number of
+    open connections at max_concurrency. Fetch tasks hand their results to a bounded queue,
+    which applies backpressure when the graph writer falls behind, and a single writer task
+    is the only code that touches the networkx graph.
+    """
+
+    def __init__(self, optimizer, max_concurrency=32, queue_size=256, url=ORS_DIRECTIONS_URL):
+        self.optimizer = optimizer
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.url = url
+
+    async def run(self, location_types=('hospital', 'blood_bank')):
+        """
+        Build the optimizer's graph: nodes for every location type, then edges for every candidate pair.
+        """
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            queue = asyncio.Queue(maxsize=self.queue_size)
+            writer = asyncio.create_task(self._write(queue))
+
+            # Locations come from the blocking Firebase SDK, so fetch them off the event loop
+            fetched = await asyncio.gather(*(
+                asyncio.to_thread(self.optimizer.fetch_locations, location_type) for location_type in location_types
+            ))
+            for location_type, locations in zip(location_types, fetched):
+                for loc_id, loc_data in (locations or {}).items():
+                    await queue.put(('node', (loc_id, loc_data, location_type)))
+            await queue.join()  # Every node is in the graph before pairs are chosen
+
+            # Cached pairs are read in one batch off the event loop; only the misses hit the API
+            cached, missing = await asyncio.to_thread(self._cached_edges, list(self.optimizer.candidate_edges()))
+            for edge in cached:
+                await queue.put(('edge', edge))
+            pairs = iter(missing)
+            fetched_routes = []
+            workers = [asyncio.create_task(self._fetch_distances(session, pairs, queue, fetched_routes))
+                       for _ in range(self.max_concurrency)]
+            await asyncio.gather(*workers)
+
+            await queue.put(None)
+            await writer
+        # Fetched routes go to the SQLite cache in one transaction, off the event loop
+        await asyncio.to_thread(self.optimizer.route_cache.put_many, fetched_routes)
+
+        logging.info(f"Async ingest built {self.optimizer.graph.number_of_nodes()} nodes and "
+                     f"{self.optimizer.graph.number_of_edges()} edges. Route cache: {self.optimizer.route_cache.stats()}")
+        return self.optimizer.graph
+
+    async def _write(self, queue):
+        while True:
+            item = await queue.get()
+            try:
+                if item is None:
+                    return
+                kind, payload = item
+                if kind == 'node':
+                    self.optimizer.process_location(*payload)
+                else:
+                    u, v, distance = payload
+                    self.optimizer.graph.add_edge(u, v, base_travel_time=distance / 1000)  # Example conversion to travel time
+            finally:
+                queue.task_done()
+
+    def _cached_edges(self, pairs):
+        """
+        Split pairs into (cached (u, v, distance) edges, pairs still to fetch).
+        """
+        nodes = self.optimizer.graph.nodes
+        cached = self.optimizer.route_cache.get_many([(nodes[u]['latitude'], nodes[u]['longitude'],
+                                                       nodes[v]['latitude'], nodes[v]['longitude']) for u, v in pairs])
+        edges = [(u, v, hit[0]) for (u, v), hit in zip(pairs, cached) if hit is not None]
+        return edges, [pair for pair, hit in zip(pairs, cached) if hit is None]
+
+    async def _fetch_distances(self, session, pairs, queue, fetched_routes):
+        # Workers share one iterator, so each pair is fetched exactly once
+        for u, v in pairs:
+            distance = await self._fetch_distance(session, u, v, fetched_routes)
+            if distance is not None:
+                await queue.put(('edge', (u, v, distance)))
+
+    async def _fetch_distance(self, session, u, v, fetched_routes):
+        nodes = self.optimizer.graph.nodes
+        lat1, lon1 = nodes[u]['latitude'], nodes[u]['longitude']
+        lat2, lon2 = nodes[v]['latitude'], nodes[v]['longitude']
+
+        payload = {"coordinates": [[lon1, lat1], [lon2, lat2]], "units": "m"}
+        try:
+            async with session.post(self.url, params={'api_key': self.optimizer.ors_api_key}, json=payload) as response:
+                response.raise_for_status()
+                data = await response.json()
+            summary = data['routes'][0]['summary']
+            fetched_routes.append((lat1, lon1, lat2, lon2, summary['distance'], summary.get('duration')))
+            return summary['distance']
+        except (IndexError, KeyError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.error(f"Error fetching distance between coordinates ({lat1}, {lon1}) and ({lat2}, {lon2}): {e}")
+            return None
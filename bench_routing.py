@@ -0,0 +1,66 @@
+import argparse
+import random
+import time
+
+import networkx as nx
+
+from alt_index import LandmarkIndex
+from csr_graph import CSRGraph
+from routing import nearest_targets
+
+
+def road_grid(side, seed=0):
+    """
+    side x side grid with base travel times of 1-3 minutes and live weights up to 50% above them.
+    """
+    rng = random.Random(seed)
+    graph = nx.convert_node_labels_to_integers(nx.grid_2d_graph(side, side))
+    for u, v, data in graph.edges(data=True):
+        data['base_travel_time'] = rng.uniform(1, 3)
+        data['weight'] = data['base_travel_time'] * rng.uniform(1, 1.5)
+    return graph
+
+
+def timed(search, queries):
+    started = time.perf_counter()
+    results = [search(source, banks) for source, banks in queries]
+    return (time.perf_counter() - started) * 1000 / len(queries), results
+
+
+def bench(side=70, banks=(5, 50, 200), k=1, queries=50, bank_sets=3, landmarks=8, seed=0):
+    """
+    Mean milliseconds per nearest-bank query for networkx Dijkstra, CSR Dijkstra and ALT over the
+    CSR arrays. Queries cycle through bank_sets bank sets, so after the first query of each set
+    ALT reuses its landmark bounds, as it does when the same blood type is requested repeatedly.
+    """
+    rng = random.Random(seed)
+    graph = road_grid(side, seed)
+    csr = CSRGraph.from_networkx(graph)
+    csr.set_weights(csr.weights_from(lambda u, v, data: graph[u][v]['weight']))
+    index = LandmarkIndex(graph, landmarks)
+    index.customize('weight')
+    nodes = list(graph.nodes)
+
+    print(f"{len(nodes)} nodes, {graph.number_of_edges()} edges, {landmarks} landmarks, k={k}")
+    print(f"{'banks':>6} {'networkx':>9} {'csr':>9} {'alt+csr':>9}")
+    for count in banks:
+        sets = [rng.sample(nodes, count) for _ in range(bank_sets)]
+        batch = [(rng.choice(nodes), sets[i % bank_sets]) for i in range(queries)]
+        plain, expected = timed(lambda s, b: nearest_targets(graph, s, b, k=k)[0], batch)
+        flat, _ = timed(lambda s, b: csr.nearest_targets(s, b, k=k)[0], batch)
+        alt, found = timed(lambda s, b: index.nearest_targets(s, b, k=k, csr_graph=csr)[0], batch)
+        for want, got in zip(expected, found):
+            assert all(abs(a - b) < 1e-3 for a, b in zip(sorted(want.values()), sorted(got.values())))
+        print(f"{count:>6} {plain:>9.2f} {flat:>9.2f} {alt:>9.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare nearest-bank search times with and without landmarks.")
+    parser.add_argument('--side', type=int, default=70, help="grid side; the graph has side^2 nodes")
+    parser.add_argument('--banks', type=int, nargs='+', default=[5, 50, 200])
+    parser.add_argument('--k', type=int, default=1)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--bank-sets', type=int, default=3)
+    parser.add_argument('--landmarks', type=int, default=8)
+    args = parser.parse_args()
+    bench(args.side, args.banks, args.k, args.queries, args.bank_sets, args.landmarks)
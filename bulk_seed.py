@@ -0,0 +1,235 @@
+import argparse
+import json
+import logging
+import random
+import string
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from data_sources import DEFAULT_CREDENTIALS, FirestoreSource, Location, Reference
+from inventory import BLOOD_TYPES
+
+ID_ALPHABET = np.array(list(string.ascii_letters + string.digits))
+FIRESTORE_BATCH_LIMIT = 500  # Firestore rejects write batches with more operations than this
+
+
+def document_ids(n, rng):
+    """
+    n random 20-character ids in the same alphabet Firestore uses for auto ids.
+    """
+    return ID_ALPHABET[rng.integers(0, len(ID_ALPHABET), (n, 20))].view('<U20').ravel().tolist()
+
+
+def random_locations(n, rng, center=(22.5726, 88.3639), spread=0.1):
+    latitudes = center[0] + rng.uniform(-spread, spread, n)
+    longitudes = center[1] + rng.uniform(-spread, spread, n)
+    return [Location(lat, lon) for lat, lon in zip(latitudes.tolist(), longitudes.tolist())]
+
+
+def phone_numbers(n, rng):
+    return ['+91' + ''.join(digits) for digits in rng.integers(0, 10, (n, 10)).astype(str).tolist()]
+
+
+def generate_labs(n, rng, start=0, center=(22.5726, 88.3639), spread=0.1, max_units=100):
+    """
+    n synthetic lab documents as (id, data) pairs, with every column drawn in one vectorized call.
+    Inventories use the canonical 8-slot encoding ordered by inventory.BLOOD_TYPES.
+    """
+    ids = document_ids(n, rng)
+    locations = random_locations(n, rng, center, spread)
+    phones = phone_numbers(n, rng)
+    stock = rng.integers(0, max_units + 1, (n, len(BLOOD_TYPES))).tolist()
+    return [
+        (ids[i], {
+            'name': f"Lab {start + i:06d}",
+            'email': f"lab{start + i:06d}@example.com",
+            'phone': phones[i],
+            'location': locations[i],
+            'blood_inventory': stock[i],
+        })
+        for i in range(n)
+    ]
+
+
+def generate_hospitals(n, rng, start=0, center=(12.9715987, 77.594566), spread=0.1, max_units=20):
+    ids = document_ids(n, rng)
+    locations = random_locations(n, rng, center, spread)
+    phones = phone_numbers(n, rng)
+    stock = rng.integers(0, max_units + 1, (n, len(BLOOD_TYPES))).tolist()
+    return [
+        (ids[i], {
+            'name': f"Hospital {start + i:06d}",
+            'location': locations[i],
+            'blood_inventory': stock[i],
+            'type': 'hospital',
+            'watchers': [],
+            'phone': phones[i],
+            'email': f"hospital{start + i:06d}@example.com",
+        })
+        for i in range(n)
+    ]
+
+
+def generate_requirements(n, hospital_ids, rng, now=None):
+    """
+    n requirement documents, each demanding 5-30 units of 2-4 distinct blood types from a random hospital.
+    """
+    now = now or datetime.now()
+    ids = document_ids(n, rng)
+    hospitals = rng.choice(np.asarray(hospital_ids), n).tolist()
+    type_counts = rng.integers(2, 5, n).tolist()
+    # Shuffled type order per row; the first type_counts[i] columns are the demanded types
+    type_order = np.argsort(rng.random((n, len(BLOOD_TYPES))), axis=1).tolist()
+    units = rng.integers(5, 31, (n, len(BLOOD_TYPES))).tolist()
+    days = rng.integers(3, 8, n).tolist()
+    post_date = now.isoformat()
+    return [
+        (ids[i], {
+            'demand': {BLOOD_TYPES[t]: units[i][j] for j, t in enumerate(type_order[i][:type_counts[i]])},
+            'hospital': Reference(f"hospitals/{hospitals[i]}"),
+            'lastDate': (now + timedelta(days=days[i])).isoformat(),
+            'postDate': post_date,
+            'respondants': [],
+        })
+        for i in range(n)
+    ]
+
+
+class FirestoreSink:
+    """
+    Write documents with WriteBatch commits of up to 500 operations, several batches in flight at once.
+    A failed commit is retried with exponential backoff; batches still failing after max_retries
+    are logged and counted in failed. With merge=True only the given fields are overwritten.
+    """
+
+    def __init__(self, db, chunk_size=FIRESTORE_BATCH_LIMIT, max_workers=8, max_retries=5, backoff=0.5, merge=False):
+        from firebase_admin import firestore
+
+        self.db = db
+        self.firestore = firestore
+        self.chunk_size = min(chunk_size, FIRESTORE_BATCH_LIMIT)
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.merge = merge
+        self.failed = 0
+
+    def write(self, collection, documents):
+        chunks = [documents[i:i + self.chunk_size] for i in range(0, len(documents), self.chunk_size)]
+        written = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._commit, collection, chunk): len(chunk) for chunk in chunks}
+            for future in as_completed(futures):
+                if future.result():
+                    written += futures[future]
+                else:
+                    self.failed += futures[future]
+        return written
+
+    def close(self):
+        pass
+
+    def _commit(self, collection, chunk):
+        for attempt in range(self.max_retries + 1):
+            batch = self.db.batch()
+            for doc_id, data in chunk:
+                batch.set(self.db.collection(collection).document(doc_id), self._encode(data), merge=self.merge)
+            try:
+                batch.commit()
+                return True
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logging.error(f"Giving up on a batch of {len(chunk)} {collection} documents: {e}")
+                    return False
+                delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                logging.warning(f"Batch commit to {collection} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _encode(self, data):
+        encoded = {}
+        for key, value in data.items():
+            if isinstance(value, Location):
+                value = self.firestore.GeoPoint(value.latitude, value.longitude)
+            elif isinstance(value, Reference):
+                value = self.db.document(value.path)
+            encoded[key] = value
+        return encoded
+
+
+class JSONLSink:
+    """
+    Dry-run sink: one {"collection", "id", "data"} JSON object per line instead of Firestore writes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'w')
+
+    def write(self, collection, documents):
+        lines = [
+            json.dumps({'collection': collection, 'id': doc_id, 'data': data}, default=_encode_json)
+            for doc_id, data in documents
+        ]
+        self._file.write('\n'.join(lines) + '\n')
+        return len(documents)
+
+    def close(self):
+        self._file.close()
+
+
+def _encode_json(value):
+    if isinstance(value, Location):
+        return {'latitude': value.latitude, 'longitude': value.longitude}
+    if isinstance(value, Reference):
+        return value.path
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+
+def seed(sink, labs=0, hospitals=0, requirements=0, hospital_ids=None, generation_batch=10000, random_seed=None):
+    """
+    Generate and write synthetic labs, hospitals and requirements in batches of generation_batch.
+    Requirements point at the generated hospitals unless hospital_ids is given. Returns written counts.
+    """
+    rng = np.random.default_rng(random_seed)
+    written = {'labs': 0, 'hospitals': 0, 'requirements': 0}
+    hospital_ids = list(hospital_ids or [])
+
+    for start in range(0, labs, generation_batch):
+        written['labs'] += sink.write('labs', generate_labs(min(generation_batch, labs - start), rng, start))
+    for start in range(0, hospitals, generation_batch):
+        documents = generate_hospitals(min(generation_batch, hospitals - start), rng, start)
+        hospital_ids.extend(doc_id for doc_id, _ in documents)
+        written['hospitals'] += sink.write('hospitals', documents)
+    if requirements and not hospital_ids:
+        raise ValueError("Requirements need hospitals: generate some or pass hospital_ids.")
+    for start in range(0, requirements, generation_batch):
+        documents = generate_requirements(min(generation_batch, requirements - start), hospital_ids, rng)
+        written['requirements'] += sink.write('requirements', documents)
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Seed Firestore with synthetic labs, hospitals and requirements.")
+    parser.add_argument('--labs', type=int, default=0)
+    parser.add_argument('--hospitals', type=int, default=0)
+    parser.add_argument('--requirements', type=int, default=0)
+    parser.add_argument('--hospital-id', action='append', default=[], help="existing hospital for requirements")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--dry-run', metavar='PATH', help="write JSONL to PATH instead of Firestore")
+    parser.add_argument('--credentials', default=DEFAULT_CREDENTIALS)
+    args = parser.parse_args()
+
+    if args.dry_run:
+        sink = JSONLSink(args.dry_run)
+    else:
+        sink = FirestoreSink(FirestoreSource(args.credentials), max_workers=args.workers)
+
+    started = time.monotonic()
+    counts = seed(sink, args.labs, args.hospitals, args.requirements, hospital_ids=args.hospital_id,
+                  random_seed=args.seed)
+    sink.close()
+    print(f"Wrote {counts} in {time.monotonic() - started:.1f}s")
@@ -0,0 +1,83 @@
+import numpy as np
+
+from inventory import BLOOD_TYPES, inventory_array
+
+# Bit i stands for BLOOD_TYPES[i]
+BLOOD_TYPE_BITS = {blood_type: 1 << i for i, blood_type in enumerate(BLOOD_TYPES)}
+
+
+def _antigens(blood_type):
+    group, rh = blood_type[:-1], blood_type[-1]
+    antigens = set(group) - {'O'}
+    if rh == '+':
+        antigens.add('D')
+    return antigens
+
+
+# A donor's red cells suit a recipient when every donor antigen (A, B, RhD) is also the recipient's
+CAN_DONATE = {
+    donor: {recipient for recipient in BLOOD_TYPES if _antigens(donor) <= _antigens(recipient)}
+    for donor in BLOOD_TYPES
+}
+
+# Bitmask of donor types each recipient type can receive
+DONOR_MASKS = {
+    recipient: sum(BLOOD_TYPE_BITS[donor] for donor in BLOOD_TYPES if recipient in CAN_DONATE[donor])
+    for recipient in BLOOD_TYPES
+}
+
+# Donor types in the order they should be used for each recipient: the exact type first, then the
+# substitutes that fewest other recipients depend on, so universal O- is drawn on last
+DONOR_PREFERENCE = {
+    recipient: sorted(
+        (donor for donor in BLOOD_TYPES if recipient in CAN_DONATE[donor]),
+        key=lambda donor: (donor != recipient, len(CAN_DONATE[donor]), BLOOD_TYPES.index(donor)),
+    )
+    for recipient in BLOOD_TYPES
+}
+
+
+def donor_mask(recipient_types):
+    """
+    Bitmask of every donor type compatible with at least one of the recipient types.
+    """
+    mask = 0
+    for blood_type in recipient_types:
+        mask |= DONOR_MASKS.get(blood_type, 0)
+    return mask
+
+
+def stock_tags(inventory):
+    """
+    Bitmask of the blood types with at least one unit in a stored inventory (see inventory.parse_inventories).
+    """
+    return int(stock_masks(inventory_array(inventory)[None])[0])
+
+
+def stock_masks(counts, units=1):
+    """
+    Per-bank bitmask of the blood types with at least `units` in stock, from a (banks x 8) count array.
+    """
+    return ((np.asarray(counts) >= units).astype(np.int64) << np.arange(len(BLOOD_TYPES))).sum(axis=1)
+
+
+def preferred_donor(stock_mask, recipient):
+    """
+    Rank (0 = exact match) and type of the first donor type in preference order present in stock_mask,
+    or (None, None) if the bank holds nothing compatible.
+    """
+    for rank, donor in enumerate(DONOR_PREFERENCE.get(recipient, [])):
+        if stock_mask & BLOOD_TYPE_BITS[donor]:
+            return rank, donor
+    return None, None
+
+
+def compatible_banks(inventory, recipient, units):
+    """
+    Every bank in an InventoryStore holding `units` of some type compatible with the recipient,
+    as (bank, rank, donor_type) with the bank's preferred donor type. One vectorized pass over all banks.
+    """
+    inventory.expire()
+    masks = stock_masks(inventory.counts, units)
+    rows = np.flatnonzero(masks & DONOR_MASKS.get(recipient, 0))
+    return [(inventory.banks[row],) + preferred_donor(int(masks[row]), recipient) for row in rows]
@@ -1,14 +1,36 @@
 import networkx as nx
+import numpy as np
 import requests
 from copy import deepcopy
 import os
 
+from alt_index import LandmarkIndex
+from compatibility import DONOR_PREFERENCE, compatible_banks
+from csr_graph import CSRGraph
+from dispatch import plan_batch
+from dynamic_paths import ShortestPathTreeCache
+from edge_weights import BackgroundWeightRefresher, EdgeWeightRefresher
+from fulfilment import plan_fulfilment
+from geo_routing import astar_nearest, bidirectional_astar, node_points, speed_bound
+from inventory import InventoryStore
+from routing import RouteOption, alternative_paths, nearest_targets, time_dependent_targets
+from traffic_profiles import TrafficProfiles
+
 class BloodSupplyChainOptimizer:
     def __init__(self, traffic_api_key, weather_api_key, google_places_api_key):
         self.graph = nx.Graph()
         self.traffic_api_key = traffic_api_key
         self.weather_api_key = weather_api_key
         self.google_places_api_key = google_places_api_key
+        self.traffic_profiles = TrafficProfiles()
+        self.weight_refresher = EdgeWeightRefresher(traffic_api_key, weather_api_key, history=self.traffic_profiles)
+        self.background_refresher = None
+        self.routing_index = None
+        self.csr_graph = None
+        self.path_trees = None
+        self.speed_bound = None
+        self.node_points = None
+        self.inventory = InventoryStore()
 
     def search_nearby_hospitals(self, latitude, longitude, radius=5000):
         """
@@ -35,10 +57,11 @@ class BloodSupplyChainOptimizer:
 
     def add_location(self, name, latitude, longitude, is_hospital=False, blood_inventory=None):
         """
-        Add a location to the graph.
+        Add a location to the graph. Its blood inventory is kept in the inventory store.
         """
-        self.graph.add_node(name, latitude=latitude, longitude=longitude, is_hospital=is_hospital,
-                            blood_inventory=blood_inventory or {})
+        self.graph.add_node(name, latitude=latitude, longitude=longitude, is_hospital=is_hospital)
+        self.inventory.add_bank(name, blood_inventory)
+        self.node_points = None
 
     def add_route(self, loc1, loc2, base_travel_time):
         """
@@ -46,117 +69,348 @@ class BloodSupplyChainOptimizer:
         """
         if loc1 in self.graph.nodes and loc2 in self.graph.nodes:
             self.graph.add_edge(loc1, loc2, base_travel_time=base_travel_time)
+            self.speed_bound = None
+            self.node_points = None
+            if self.path_trees is not None:
+                self.path_trees.update(None)
         else:
             raise ValueError(f"One or both locations {loc1} and {loc2} are not in the graph.")
 
     def update_edge_weights(self):
         """
         Update edge weights dynamically based on real-time traffic and weather data.
+        Factors are fetched in batches and cached, so only expired ones cost a network call.
         """
-        for u, v, data in self.graph.edges(data=True):
-            if 'latitude' in self.graph.nodes[u] and 'latitude' in self.graph.nodes[v]:
-                base_time = data['base_travel_time']
-                traffic_factor = self.get_real_time_traffic(u, v)
-                weather_factor = self.get_real_time_weather(u, v)
-                data['weight'] = base_time * (1 + traffic_factor + weather_factor)
-            else:
-                print(f"Skipping edge ({u}, {v}) due to missing latitude/longitude data.")
+        self.weight_refresher.refresh(self.graph)
+        if self.csr_graph is not None:
+            previous = self.csr_graph.weights
+            self.csr_graph.apply_factors(*self.weight_refresher.factor_arrays(self.csr_graph))
+            edges = self.csr_graph.edges()
+            changed = [edges[i] for i in np.flatnonzero(self.csr_graph.weights != previous)]
+        else:
+            previous = {(u, v): weight for u, v, weight in self.graph.edges(data='weight')}
+            self.weight_refresher.apply(self.graph)
+            changed = [(u, v) for u, v, weight in self.graph.edges(data='weight') if weight != previous[(u, v)]]
+        if self.routing_index is not None:
+            self.routing_index.customize(self._graph_weight())
+        if self.path_trees is not None:
+            self.path_trees.update(changed, self._graph_weight())
 
-    def get_real_time_traffic(self, loc1, loc2):
+    def enable_path_cache(self, max_trees=16, min_queries=2):
         """
-        Fetch real-time traffic data between two locations.
+        Cache shortest-path trees for hospitals that keep sending requests. Their bank searches
+        become a lookup, and weight refreshes repair the trees only where edges changed.
         """
-        try:
-            origin = f"{self.graph.nodes[loc1]['latitude']},{self.graph.nodes[loc1]['longitude']}"
-            destination = f"{self.graph.nodes[loc2]['latitude']},{self.graph.nodes[loc2]['longitude']}"
-            traffic_data = requests.get(
-                f"https://maps.googleapis.com/maps/api/distancematrix/json?origins={origin}&destinations={destination}&key={self.traffic_api_key}"
-            ).json()
-            duration = traffic_data['rows'][0]['elements'][0]['duration']['value']
-            return duration / 60.0  # Convert to minutes
-        except (IndexError, KeyError, requests.RequestException) as e:
-            print(f"Error fetching traffic data between {loc1} and {loc2}: {e}")
-            return 0
+        self.path_trees = ShortestPathTreeCache(self.graph, self._graph_weight(), max_trees, min_queries)
+        self._follow_refresher()
+        return self.path_trees
 
-    def get_real_time_weather(self, loc1, loc2):
+    def compact_graph(self):
         """
-        Fetch real-time weather data for a location.
+        Freeze the current graph into CSR arrays. From then on weight updates are written to the
+        arrays in one vectorized step and bank searches run over them; self.graph is kept for
+        locations and as the networkx view. Call again after adding locations or routes.
         """
-        try:
-            latitude = self.graph.nodes[loc1]['latitude']
-            longitude = self.graph.nodes[loc1]['longitude']
-            weather_data = requests.get(
-                f"https://api.weather.com/weather?lat={latitude}&lon={longitude}&key={self.weather_api_key}"
-            ).json()
-            return weather_data.get('weather_factor', 0)  # Default to 0 if no data available
-        except (KeyError, IndexError, requests.RequestException) as e:
-            print(f"Error fetching weather data for {loc1}: {e}")
-            return 0
-
-    def find_optimal_route(self, hospital_name, blood_type, required_units, urgency='regular'):
+        self.csr_graph = CSRGraph.from_networkx(self.graph)
+        if self.path_trees is not None:
+            self.path_trees.update(None, self.csr_graph.weight)
+        self._follow_refresher()
+        return self.csr_graph
+
+    def _graph_weight(self):
+        return self.csr_graph.weight if self.csr_graph is not None else 'weight'
+
+    def build_routing_index(self, landmarks=8, max_k=4, max_targets=16):
         """
-        Find the optimal route to fulfill a hospital's blood request.
+        Precompute landmark distances so route queries for at most max_k of at most max_targets
+        banks run as A* instead of plain Dijkstra. Landmarks are measured on base travel times,
+        which live weights never undercut, and the index is re-customised whenever refreshed
+        weights come in. Call again after adding locations.
+        """
+        self.routing_index = LandmarkIndex(self.graph, landmarks, max_k=max_k, max_targets=max_targets)
+        self._follow_refresher()
+        return self.routing_index
+
+    def learn_traffic_profiles(self, path=None):
+        """
+        Average the traffic durations fetched so far into quarter-hour profiles per edge,
+        optionally saving them so a later run can start from load_traffic_profiles().
+        """
+        self.traffic_profiles.learn()
+        if path is not None:
+            self.traffic_profiles.save(path)
+        return self.traffic_profiles
+
+    def load_traffic_profiles(self, path):
+        self.traffic_profiles = TrafficProfiles.load(path)
+        self.weight_refresher.history = self.traffic_profiles
+        return self.traffic_profiles
+
+    def start_weight_refresher(self, interval=60):
+        """
+        Move traffic and weather refreshes onto a background thread.
+        Routing then reads the latest published weight snapshot instead of refreshing per request.
+        The CSR weights, landmark index and path trees are synced on that thread before each
+        snapshot is published, so no request pays for catching up with a new version.
+        """
+        if self.background_refresher is None:
+            self.background_refresher = BackgroundWeightRefresher(self.graph, self.weight_refresher, interval,
+                                                                  on_publish=self._sync_snapshot)
+            self._follow_refresher()
+            self.background_refresher.start()
+        return self.background_refresher
+
+    def stop_weight_refresher(self):
+        """
+        Stop the background refresher and go back to refreshing weights on every request.
+        """
+        if self.background_refresher is not None:
+            self.background_refresher.stop()
+            self.background_refresher = None
+
+    def current_weight(self):
         """
+        Return the edge weight used for routing: the latest background snapshot if one is
+        running, otherwise the weights refreshed in place on the graph.
+        """
+        if self.background_refresher is not None:
+            return self.background_refresher.current().weight
         self.update_edge_weights()
+        return self._graph_weight()
+
+    def _sync_snapshot(self, snapshot):
+        # Runs on the refresher thread; each structure swaps in its new state in one assignment
+        # The snapshot was built from the refresher's caches, whose factor arrays give the same weights
+        if self.csr_graph is not None and self.csr_graph.version != snapshot.version:
+            self.csr_graph.apply_factors(*self.weight_refresher.factor_arrays(self.csr_graph), snapshot.version)
+        if self.routing_index is not None:
+            self.routing_index.customize(snapshot.weight, snapshot.version)
+        if self.path_trees is not None:
+            self.path_trees.sync_snapshot(snapshot)
+
+    def _follow_refresher(self):
+        # Structures built while a refresher runs start from its current snapshot
+        if self.background_refresher is not None:
+            self._sync_snapshot(self.background_refresher.current())
+
+    def nearest_banks(self, hospital_name, banks, k=None, weight='weight', departure=None, algorithm=None):
+        """
+        Settle the k nearest of the given banks from the hospital: from a cached shortest-path tree
+        for frequent hospitals, otherwise through the landmark index for small k, or the CSR arrays
+        when built.
+        A departure time switches to a time-dependent search over the traffic profiles, and
+        algorithm='astar' or 'bidirectional' to A* guided by straight-line distance to the banks.
+        The two cannot be combined: the A* searches only know static weights.
+        """
+        if algorithm not in (None, 'dijkstra', 'astar', 'bidirectional'):
+            raise ValueError(f"Unknown routing algorithm {algorithm}.")
+        if algorithm is not None and departure is not None:
+            raise ValueError(f"A departure time cannot be combined with algorithm={algorithm!r}.")
+        if algorithm in ('astar', 'bidirectional'):
+            if self.speed_bound is None:
+                self.speed_bound = speed_bound(self.graph)
+            if self.node_points is None:
+                self.node_points = node_points(self.graph)
+            if algorithm == 'bidirectional':
+                return bidirectional_astar(self.graph, hospital_name, banks, weight=weight,
+                                           speed=self.speed_bound, points=self.node_points)
+            return astar_nearest(self.graph, hospital_name, banks, k=k, weight=weight,
+                                 speed=self.speed_bound, points=self.node_points)
+        if departure is not None:
+            if hasattr(departure, 'timestamp'):
+                departure = departure.timestamp()
+            edge_cost = self.traffic_profiles.edge_cost(departure)
+            return time_dependent_targets(self.graph, hospital_name, banks, edge_cost, k=k)
+        if self.path_trees is not None:
+            cached = self.path_trees.lookup(hospital_name, banks, k=k)
+            if cached is not None:
+                return cached
+        # Landmarks only pay off when the search may stop after a few of a few banks
+        if self.routing_index is not None and self.routing_index.helps(k, len(banks)):
+            return self.routing_index.nearest_targets(hospital_name, banks, k=k, weight=weight,
+                                                      csr_graph=self.csr_graph)
+        if self.csr_graph is not None:
+            return self.csr_graph.nearest_targets(hospital_name, banks, k=k)
+        return nearest_targets(self.graph, hospital_name, banks, k=k, weight=weight)
+
+    def route_options(self, hospital_name, blood_type, required_units, k=None, urgency='regular',
+                      allow_substitutes=False, departure=None, algorithm=None):
+        """
+        Ranked bank options for a request from a single search, best first, as RouteOption objects
+        whose paths are only built when read.
+
+        All eligible blood banks are resolved by one search from the hospital (A* when a
+        routing index is built and few banks are wanted), which stops once k of them (all when
+        k is None) have been settled. With allow_substitutes, banks holding any ABO/Rh-compatible
+        type qualify; exact matches rank first, then banks whose substitute is least scarce, and
+        travel time decides within each tier.
+
+        With a departure time (datetime or Unix timestamp) the search runs over the learned
+        traffic profiles for that time of day instead of live weights, so no API call is made.
+        algorithm='astar' uses A* towards the eligible banks with a haversine / top-speed bound;
+        'bidirectional' also searches back from the banks but only finds the nearest one;
+        passing both a departure and an algorithm raises ValueError.
+        """
+        weight = self.current_weight() if departure is None else None
 
-        best_time = float('inf')
-        best_path = None
-        backup_paths = []
-
-        for blood_bank in self.graph.nodes():
-            if not self.graph.nodes[blood_bank]['is_hospital']:
-                inventory = self.graph.nodes[blood_bank]['blood_inventory']
-                if inventory.get(blood_type, 0) >= required_units:
-                    try:
-                        path_length = nx.dijkstra_path_length(self.graph, hospital_name, blood_bank, weight='weight')
-                        if urgency == 'immediate':
-                            path_length *= 1.0  # Higher priority
-                        else:
-                            path_length *= 1.2  # Normal priority
-                        if path_length < best_time:
-                            if best_path:
-                                backup_paths.append((best_path, best_time))  # Save the previous best path as a backup
-                            best_time = path_length
-                            best_path = nx.dijkstra_path(self.graph, hospital_name, blood_bank, weight='weight')
-                        else:
-                            backup_paths.append(
-                                (nx.dijkstra_path(self.graph, hospital_name, blood_bank, weight='weight'), path_length))
-                    except nx.NetworkXNoPath:
-                        continue
-
-        return best_path, best_time, backup_paths
+        if allow_substitutes:
+            donor_ranks = {bank: rank for bank, rank, _ in compatible_banks(self.inventory, blood_type, required_units)}
+        else:
+            donor_ranks = {bank: 0 for bank in self.inventory.banks_with(blood_type, required_units)}
+        eligible_banks = [blood_bank for blood_bank in donor_ranks if not self.graph.nodes[blood_bank]['is_hospital']]
+        distances, paths = self.nearest_banks(hospital_name, eligible_banks, k=k, weight=weight,
+                                              departure=departure, algorithm=algorithm)
+
+        if urgency == 'immediate':
+            priority = 1.0  # Higher priority
+        else:
+            priority = 1.2  # Normal priority
+
+        # distances come nearest first, and the stable sort keeps that order within a rank
+        options = [
+            RouteOption(blood_bank, path_length * priority, paths, donor_ranks[blood_bank])
+            for blood_bank, path_length in distances.items()
+        ]
+        options.sort(key=lambda option: option.rank)
+        return options
+
+    def find_optimal_route(self, hospital_name, blood_type, required_units, urgency='regular', max_banks=None,
+                           allow_substitutes=False, departure=None, algorithm=None):
+        """
+        Find the optimal route to fulfill a hospital's blood request.
+
+        Returns the best path, its travel time and the backup options nearest first (see
+        route_options); backups unpack as (path, travel_time) and build their path on first use.
+        """
+        options = self.route_options(hospital_name, blood_type, required_units, k=max_banks, urgency=urgency,
+                                     allow_substitutes=allow_substitutes, departure=departure, algorithm=algorithm)
+        if not options:
+            return None, float('inf'), []
+        return options[0].path, options[0].cost, options[1:]
+
+    def alternative_routes(self, hospital_name, blood_bank_name, k=3, closed=()):
+        """
+        Up to k alternative routes from a hospital to one bank, cheapest first (Yen's algorithm),
+        for when a road on the best route is closed. closed lists (u, v) edges to avoid.
+        """
+        return alternative_paths(self.graph, hospital_name, blood_bank_name, k=k, weight=self.current_weight(),
+                                 closed=closed)
 
     def process_immediate_request(self, hospital_name, blood_type, required_units):
         """
         Handle an immediate request from a hospital.
         """
-        best_path, best_time, backup_paths = self.find_optimal_route(hospital_name, blood_type, required_units,
-                                                                     urgency='immediate')
-
-        if best_path:
-            # Deduct the required units from the blood bank's inventory
-            blood_bank = best_path[-1]
-            if self.graph.nodes[blood_bank]['blood_inventory'][blood_type] >= required_units:
-                self.graph.nodes[blood_bank]['blood_inventory'][blood_type] -= required_units
-                return best_path, best_time
-            else:
-                # If inventory is insufficient, try backup paths
-                for backup_path, _ in backup_paths:
-                    blood_bank_backup = backup_path[-1]
-                    if self.graph.nodes[blood_bank_backup]['blood_inventory'][blood_type] >= required_units:
-                        self.graph.nodes[blood_bank_backup]['blood_inventory'][blood_type] -= required_units
-                        return backup_path, _
+        options = self.route_options(hospital_name, blood_type, required_units, urgency='immediate')
+
+        # Reserve the units atomically, falling back to the next option if another request took them first;
+        # only the path that is finally used gets built
+        for option in options:
+            reservation = self.inventory.reserve(option.target, blood_type, required_units)
+            if reservation is not None:
+                self.inventory.commit(reservation)
+                return option.path, option.cost
         return None, None  # No suitable blood bank found
 
+    def process_compatible_request(self, hospital_name, blood_type, required_units):
+        """
+        Handle an immediate request that accepts any ABO/Rh-compatible blood type.
+        Returns the path, the travel time and the blood type that was dispatched.
+        """
+        options = self.route_options(hospital_name, blood_type, required_units, urgency='immediate',
+                                     allow_substitutes=True)
+
+        for option in options:
+            for donor_type in DONOR_PREFERENCE[blood_type]:
+                reservation = self.inventory.reserve(option.target, donor_type, required_units)
+                if reservation is not None:
+                    self.inventory.commit(reservation)
+                    return option.path, option.cost, donor_type
+        return None, None, None  # No compatible blood bank found
+
+    def process_multi_request(self, hospital_name, demand, max_banks=None, attempts=3, commit=True):
+        """
+        Handle a multi-type, multi-unit demand ({blood_type: units}) that may need several banks.
+
+        Candidate banks come from one Dijkstra search from the hospital; the fulfilment planner
+        splits the demand across them to keep total travel time low, and every pickup is reserved
+        before any is committed. If another request takes stock in between, the plan is rebuilt.
+        Returns (pickups, shortfall) where each pickup is a dict with the bank, path, travel time
+        and units per blood type. With commit=False the units stay on hold and each pickup also
+        carries its 'reservations' for the caller to commit or release.
+        """
+        weight = self.current_weight()
+        candidate_banks = {
+            blood_bank for blood_type in demand for blood_bank in self.inventory.banks_with(blood_type, 1)
+            if not self.graph.nodes[blood_bank]['is_hospital']
+        }
+        distances, paths = self.nearest_banks(hospital_name, candidate_banks, k=max_banks, weight=weight)
+
+        for _ in range(attempts):
+            stock = {blood_bank: self.inventory.as_dict(blood_bank) for blood_bank in distances}
+            plan, shortfall = plan_fulfilment(demand, distances, stock)
+
+            reservations = [
+                self.inventory.reserve(blood_bank, blood_type, amount)
+                for blood_bank, units in plan for blood_type, amount in units.items()
+            ]
+            if None not in reservations:
+                pickups = [
+                    {'bank': blood_bank, 'path': paths[blood_bank], 'travel_time': distances[blood_bank], 'units': units}
+                    for blood_bank, units in plan
+                ]
+                for pickup in pickups:
+                    held = [reservation for reservation in reservations if reservation.bank == pickup['bank']]
+                    if commit:
+                        for reservation in held:
+                            self.inventory.commit(reservation)
+                    else:
+                        pickup['reservations'] = held
+                return pickups, shortfall
+
+            # Stock changed while planning; give everything back and plan again
+            for reservation in reservations:
+                if reservation is not None:
+                    self.inventory.release(reservation)
+
+        return [], dict(demand)
+
+    def dispatch_batch(self, requests):
+        """
+        Serve many pending requests jointly instead of one find_optimal_route call each.
+
+        requests maps a request id to (hospital_name, {blood_type: units}). Distances between the
+        involved hospitals and banks come from one nearest_banks search per hospital, or per bank
+        when there are fewer banks, and units are allocated with a min-cost flow over current
+        stock. Returns (assignments, shortfall) keyed by request id.
+        """
+        weight = self.current_weight()
+        blood_types = {blood_type for _, demand in requests.values() for blood_type in demand}
+        banks = {
+            blood_bank for blood_type in blood_types for blood_bank in self.inventory.banks_with(blood_type, 1)
+            if not self.graph.nodes[blood_bank]['is_hospital']
+        }
+        stock = {blood_bank: self.inventory.as_dict(blood_bank) for blood_bank in banks}
+        search = lambda source, targets: self.nearest_banks(source, targets, weight=weight)
+        assignments, shortfall = plan_batch(self.graph, requests, stock, weight=weight, search=search)
+
+        for request_id, pickups in assignments.items():
+            for pickup in list(pickups):
+                reservation = self.inventory.reserve(pickup['bank'], pickup['blood_type'], pickup['units'])
+                if reservation is None:
+                    # Another request took the stock after planning
+                    pickups.remove(pickup)
+                    missing = shortfall.setdefault(request_id, {})
+                    missing[pickup['blood_type']] = missing.get(pickup['blood_type'], 0) + pickup['units']
+                else:
+                    self.inventory.commit(reservation)
+        return assignments, shortfall
+
     def restock_blood_bank(self, blood_bank_name, blood_type, units):
         """
         Restock a blood bank with specific units of a blood type.
         """
         if not self.graph.nodes[blood_bank_name]['is_hospital']:
-            if blood_type in self.graph.nodes[blood_bank_name]['blood_inventory']:
-                self.graph.nodes[blood_bank_name]['blood_inventory'][blood_type] += units
-            else:
-                self.graph.nodes[blood_bank_name]['blood_inventory'][blood_type] = units
+            self.inventory.restock(blood_bank_name, blood_type, units)
 
     def scalable_add_locations(self, locations):
         """
@@ -56,14 +56,15 @@ class BloodSupplyChainOptimizer:
         for u, v, data in self.graph.edges(data=True):
             print(f"Edge: ({u}, {v}), Data: {data}")
 
-# Example usage
-optimizer = BloodSupplyChainOptimizer()
+if __name__ == '__main__':
+    # Example usage
+    optimizer = BloodSupplyChainOptimizer()
 
-# Fetch and add hospitals and blood banks
-latitude = 13.082680
-longitude = 80.270721
-optimizer.fetch_and_add_locations(latitude, longitude, location_type='hospital')
-optimizer.fetch_and_add_locations(latitude, longitude, location_type='blood_bank')
+    # Fetch and add hospitals and blood banks
+    latitude = 13.082680
+    longitude = 80.270721
+    optimizer.fetch_and_add_locations(latitude, longitude, location_type='hospital')
+    optimizer.fetch_and_add_locations(latitude, longitude, location_type='blood_bank')
 
-# Print the graph details
-optimizer.print_graph()
+    # Print the graph details
+    optimizer.print_graph()
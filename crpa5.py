@@ -2,11 +2,22 @@ import networkx as nx
 import requests
 import random
 
+from geo_index import candidate_edges, check_graph_mode
+from ors_matrix import ORSMatrixClient, bulk_edge_distances
+from route_cache import RouteCache
+
 
 class BloodSupplyChainOptimizer:
-    def __init__(self, ors_api_key):
+    def __init__(self, ors_api_key, graph_mode='complete', neighbours=5, radius=None, cache_path='ors_cache.sqlite'):
+        check_graph_mode(graph_mode, radius)
+
         self.graph = nx.Graph()
         self.ors_api_key = ors_api_key
+        self.graph_mode = graph_mode
+        self.neighbours = neighbours
+        self.radius = radius
+        self.route_cache = RouteCache(cache_path)
+        self.matrix_client = ORSMatrixClient(ors_api_key)
 
     def fetch_and_add_locations(self, latitude, longitude, radius=5000, location_type='hospital'):
         """
@@ -52,26 +63,49 @@ class BloodSupplyChainOptimizer:
         self.graph.add_node(name, latitude=latitude, longitude=longitude, is_hospital=is_hospital,
                             blood_inventory=blood_inventory)
 
-    def add_edges_between_nodes(self):
+    def candidate_edges(self):
+        """
+        List the node pairs to connect according to graph_mode (see geo_index.candidate_edges).
+        """
+        return candidate_edges(self.graph, self.graph_mode, k=self.neighbours, radius=self.radius)
+
+    def add_edges_between_nodes(self, bulk=False):
         """
         Add edges between nodes using real distances obtained from the OpenRouteService API.
+        Only the pairs chosen by candidate_edges are requested. With bulk=True they are fetched
+        tile by tile from the matrix endpoint and inserted into the graph in one call.
         """
-        for u in self.graph.nodes:
-            for v in self.graph.nodes:
-                if u != v:
-                    distance = self.calculate_real_distance(
-                        self.graph.nodes[u]['latitude'],
-                        self.graph.nodes[u]['longitude'],
-                        self.graph.nodes[v]['latitude'],
-                        self.graph.nodes[v]['longitude']
-                    )
-                    if distance:
-                        self.graph.add_edge(u, v, base_travel_time=distance / 1000)  # Example conversion to travel time
-
-    def calculate_real_distance(self, lat1, lon1, lat2, lon2):
+        if bulk:
+            edges = bulk_edge_distances(self.matrix_client, self.graph, self.candidate_edges(), self.route_cache)
+            self.graph.add_edges_from((u, v, {'base_travel_time': distance / 1000}) for u, v, distance in edges)
+            print(f"Added {len(edges)} edges in bulk. Route cache: {self.route_cache.stats()}")
+            return
+
+        fetched_routes = []
+        for u, v in self.candidate_edges():
+            distance = self.calculate_real_distance(
+                self.graph.nodes[u]['latitude'],
+                self.graph.nodes[u]['longitude'],
+                self.graph.nodes[v]['latitude'],
+                self.graph.nodes[v]['longitude'],
+                fetched_routes
+            )
+            if distance:
+                self.graph.add_edge(u, v, base_travel_time=distance / 1000)  # Example conversion to travel time
+        self.route_cache.put_many(fetched_routes)  # One transaction for every route fetched above
+        print(f"Route cache: {self.route_cache.stats()}")
+
+    def calculate_real_distance(self, lat1, lon1, lat2, lon2, fetched_routes=None):
         """
         Calculate the real distance between two points using the OpenRouteService API.
+        Results are kept in the persistent route cache, so repeated pairs make no network call.
+        With a fetched_routes list the new route is appended to it for one put_many later
+        instead of being written straight away.
         """
+        cached = self.route_cache.get(lat1, lon1, lat2, lon2)
+        if cached is not None:
+            return cached[0]
+
         try:
             url = f"https://api.openrouteservice.org/v2/directions/driving-car?api_key={self.ors_api_key}"
             payload = {
@@ -85,6 +119,11 @@ class BloodSupplyChainOptimizer:
             response.raise_for_status()
             data = response.json()
             distance = data['routes'][0]['summary']['distance']
+            route = (lat1, lon1, lat2, lon2, distance, data['routes'][0]['summary'].get('duration'))
+            if fetched_routes is None:
+                self.route_cache.put_many([route])
+            else:
+                fetched_routes.append(route)
             return distance
         except (IndexError, KeyError, requests.RequestException) as e:
             print(f"Error fetching distance between coordinates ({lat1}, {lon1}) and ({lat2}, {lon2}): {e}")
@@ -103,18 +142,19 @@ class BloodSupplyChainOptimizer:
             print(f"Edge: ({u}, {v}), Data: {data}")
 
 
-# Example usage
-ors_api_key = "5b3ce3597851110001cf62484c8507e38f224cfb97cfd5794311eadd"  # Replace with your OpenRouteService API key
-optimizer = BloodSupplyChainOptimizer(ors_api_key)
+if __name__ == '__main__':
+    # Example usage
+    ors_api_key = "5b3ce3597851110001cf62484c8507e38f224cfb97cfd5794311eadd"  # Replace with your OpenRouteService API key
+    optimizer = BloodSupplyChainOptimizer(ors_api_key)
 
-# Fetch and add hospitals and blood banks
-latitude = 13.082680
-longitude = 80.270721
-optimizer.fetch_and_add_locations(latitude, longitude, location_type='hospital')
-optimizer.fetch_and_add_locations(latitude, longitude, location_type='blood_bank')
+    # Fetch and add hospitals and blood banks
+    latitude = 13.082680
+    longitude = 80.270721
+    optimizer.fetch_and_add_locations(latitude, longitude, location_type='hospital')
+    optimizer.fetch_and_add_locations(latitude, longitude, location_type='blood_bank')
 
-# Add edges between nodes using real distances
-optimizer.add_edges_between_nodes()
+    # Add edges between nodes using real distances
+    optimizer.add_edges_between_nodes()
 
-# Print the graph details
-optimizer.print_graph()
+    # Print the graph details
+    optimizer.print_graph()
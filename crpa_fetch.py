@@ -1,5 +1,3 @@
-import firebase_admin
-from firebase_admin import credentials, db
 import networkx as nx
 import requests
 import random
@@ -7,27 +5,38 @@ import logging
 from concurrent.futures import ThreadPoolExecutor, as_completed
 #import matplotlib.pyplot as plt
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from data_sources import RealtimeDatabaseSource
+from geo_index import candidate_edges, check_graph_mode
+from ors_matrix import ORSMatrixClient, bulk_edge_distances
+from route_cache import RouteCache
 
 class BloodSupplyChainOptimizer:
-    def __init__(self, ors_api_key):
+    def __init__(self, ors_api_key, graph_mode='complete', neighbours=5, radius=None, cache_path='ors_cache.sqlite',
+                 source=None):
+        check_graph_mode(graph_mode, radius)
+
         self.graph = nx.Graph()
         self.ors_api_key = ors_api_key
+        self.graph_mode = graph_mode
+        self.neighbours = neighbours
+        self.radius = radius
+        self.route_cache = RouteCache(cache_path)
+        self.matrix_client = ORSMatrixClient(ors_api_key)
+
+        # Firebase is only initialized on the first read; pass a data_sources.JSONTreeSource to read a local export
+        self.source = source or RealtimeDatabaseSource()
 
-        # Initialize Firebase
-        cred = credentials.Certificate('/home/anirudh/Blood_reaper/blood-reaper-f7580-firebase-adminsdk-dwyff-21dae7f7ea.json')
-        firebase_admin.initialize_app(cred, {
-            'databaseURL': "https://blood-reaper-f7580-default-rtdb.firebaseio.com"
-        })
+    def fetch_locations(self, location_type='hospital'):
+        """
+        Read the raw location records of a specific type from the data source.
+        """
+        return self.source.get(f'/{location_type}')
 
     def fetch_and_add_locations(self, location_type='hospital'):
         """
         Fetch locations of a specific type (e.g., hospitals or blood banks) from Firebase and add them to the graph.
         """
-        ref_path = f'/{location_type}'
-        ref = db.reference(ref_path)
-        locations = ref.get()
+        locations = self.fetch_locations(location_type)
 
         if locations:
             logging.info(f"Fetched {len(locations)} {location_type} from Firebase.")
@@ -68,20 +77,48 @@ class BloodSupplyChainOptimizer:
         self.graph.add_node(name, latitude=latitude, longitude=longitude, is_hospital=is_hospital, blood_inventory=blood_inventory)
         logging.info(f"Added location: {name}")
 
-    def add_edges_between_nodes(self):
+    def build_graph_async(self, location_types=('hospital', 'blood_bank'), max_concurrency=32):
+        """
+        Fetch locations and road distances and build the graph with the asyncio ingest pipeline.
+        A single writer task owns the graph, so the build is race-free.
+        """
+        # aiohttp is only loaded when the async pipeline is actually used
+        import asyncio
+        from async_ingest import AsyncIngestPipeline
+
+        pipeline = AsyncIngestPipeline(self, max_concurrency=max_concurrency)
+        return asyncio.run(pipeline.run(location_types))
+
+    def candidate_edges(self):
+        """
+        List the node pairs to connect according to graph_mode (see geo_index.candidate_edges).
+        """
+        return candidate_edges(self.graph, self.graph_mode, k=self.neighbours, radius=self.radius)
+
+    def add_edges_between_nodes(self, bulk=False):
         """
         Add edges between nodes using real distances obtained from the OpenRouteService API.
+        Only the pairs chosen by candidate_edges are requested. With bulk=True they are fetched
+        tile by tile from the matrix endpoint and inserted into the graph in one call.
         """
-        nodes = list(self.graph.nodes)
+        if bulk:
+            edges = bulk_edge_distances(self.matrix_client, self.graph, self.candidate_edges(), self.route_cache)
+            self.graph.add_edges_from((u, v, {'base_travel_time': distance / 1000}) for u, v, distance in edges)
+            logging.info(f"Added {len(edges)} edges in bulk. Route cache: {self.route_cache.stats()}")
+            return
+
+        fetched_routes = []
         with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = [executor.submit(self.process_edge, u, v) for u in nodes for v in nodes if u != v]
+            futures = [executor.submit(self.process_edge, u, v, fetched_routes) for u, v in self.candidate_edges()]
             for future in as_completed(futures):
                 try:
                     future.result()
                 except Exception as e:
                     logging.error(f"Error processing edge: {e}")
+        self.route_cache.put_many(fetched_routes)  # One transaction for every route fetched above
+        logging.info(f"Route cache: {self.route_cache.stats()}")
 
-    def process_edge(self, u, v):
+    def process_edge(self, u, v, fetched_routes=None):
         """
         Calculate the distance between two nodes and add an edge to the graph.
         """
@@ -90,7 +127,8 @@ class BloodSupplyChainOptimizer:
                 self.graph.nodes[u]['latitude'],
                 self.graph.nodes[u]['longitude'],
                 self.graph.nodes[v]['latitude'],
-                self.graph.nodes[v]['longitude']
+                self.graph.nodes[v]['longitude'],
+                fetched_routes
             )
             if distance is not None:
                 self.graph.add_edge(u, v, base_travel_time=distance / 1000)  # Example conversion to travel time
@@ -98,10 +136,17 @@ class BloodSupplyChainOptimizer:
         except Exception as e:
             logging.error(f"Error adding edge between {u} and {v}: {e}")
 
-    def calculate_real_distance(self, lat1, lon1, lat2, lon2):
+    def calculate_real_distance(self, lat1, lon1, lat2, lon2, fetched_routes=None):
         """
         Calculate the real distance between two points using the OpenRouteService API.
+        Results are kept in the persistent route cache, so repeated pairs make no network call.
+        With a fetched_routes list the new route is appended to it for one put_many later
+        instead of being written straight away.
         """
+        cached = self.route_cache.get(lat1, lon1, lat2, lon2)
+        if cached is not None:
+            return cached[0]
+
         try:
             url = f"https://api.openrouteservice.org/v2/directions/driving-car?api_key={self.ors_api_key}"
             payload = {
@@ -115,6 +160,11 @@ class BloodSupplyChainOptimizer:
             response.raise_for_status()
             data = response.json()
             distance = data['routes'][0]['summary']['distance']
+            route = (lat1, lon1, lat2, lon2, distance, data['routes'][0]['summary'].get('duration'))
+            if fetched_routes is None:
+                self.route_cache.put_many([route])
+            else:
+                fetched_routes.append(route)
             return distance
         except (IndexError, KeyError, requests.RequestException) as e:
             logging.error(f"Error fetching distance between coordinates ({lat1}, {lon1}) and ({lat2}, {lon2}): {e}")
@@ -152,19 +202,19 @@ class BloodSupplyChainOptimizer:
         for u, v, data in self.graph.edges(data=True):
             logging.info(f"Edge: ({u}, {v}), Data: {data}")
 
-# Example usage
-ors_api_key = "5b3ce3597851110001cf62484c8507e38f224cfb97cfd5794311eadd"  # Replace with your OpenRouteService API key
-optimizer = BloodSupplyChainOptimizer(ors_api_key)
+if __name__ == '__main__':
+    # Configure logging
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Fetch and add hospitals and blood banks
-optimizer.fetch_and_add_locations(location_type='hospital')
-optimizer.fetch_and_add_locations(location_type='blood_bank')
+    # Example usage
+    ors_api_key = "5b3ce3597851110001cf62484c8507e38f224cfb97cfd5794311eadd"  # Replace with your OpenRouteService API key
+    optimizer = BloodSupplyChainOptimizer(ors_api_key)
 
-# Add edges between nodes using real distances
-optimizer.add_edges_between_nodes()
+    # Fetch hospitals and blood banks and add edges between them using real distances
+    optimizer.build_graph_async(location_types=('hospital', 'blood_bank'))
 
-# Print the graph details
-optimizer.print_graph()
+    # Print the graph details
+    optimizer.print_graph()
 
-# Visualize the graph
-#optimizer.visualize_graph()
\ No newline at end of file
+    # Visualize the graph
+    #optimizer.visualize_graph()
@@ -0,0 +1,219 @@
+import heapq
+from itertools import count
+
+import networkx as nx
+import numpy as np
+
+from routing import LazyPaths, build_path
+
+NODE_DTYPE = np.dtype([('latitude', np.float64), ('longitude', np.float64), ('is_hospital', np.bool_)])
+
+
+class CSRGraph:
+    """
+    Compact, array-backed copy of an undirected routing graph.
+
+    Nodes get integer ids (names maps id -> name, index maps name -> id) and their attributes
+    live in one structured array. Each edge is stored once in edge_u / edge_v with float32
+    base_travel_time and weight arrays, and the adjacency is a CSR layout (indptr, indices)
+    whose slots point back at their edge through slot_edge, so a weight update is a single
+    array assignment instead of a walk over per-edge dicts. Blood inventory is not copied;
+    it stays in the InventoryStore.
+    """
+
+    def __init__(self, names, nodes, edge_u, edge_v, base):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.nodes = nodes
+        self.edge_u = edge_u
+        self.edge_v = edge_v
+        self.base = base
+        self.weights = base.copy()
+        self.version = None
+        self._adjacency = None
+
+        n = len(self.names)
+        sources = np.concatenate([edge_u, edge_v])
+        destinations = np.concatenate([edge_v, edge_u])
+        edges = np.concatenate([np.arange(len(edge_u), dtype=np.int32)] * 2)
+        order = np.lexsort((destinations, sources))
+        self.indices = destinations[order]
+        self.slot_edge = edges[order]
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=self.indptr[1:])
+
+    @classmethod
+    def from_networkx(cls, graph, base='base_travel_time'):
+        """
+        Freeze a networkx graph; edges without the base attribute get a base time of 1.
+        """
+        names = list(graph.nodes)
+        index = {name: i for i, name in enumerate(names)}
+        nodes = np.zeros(len(names), dtype=NODE_DTYPE)
+        for i, (name, data) in enumerate(graph.nodes(data=True)):
+            nodes[i] = (float(data.get('latitude', np.nan)), float(data.get('longitude', np.nan)),
+                        bool(data.get('is_hospital', False)))
+
+        edges = list(graph.edges(data=base, default=1))
+        edge_u = np.fromiter((index[u] for u, _, _ in edges), dtype=np.int32, count=len(edges))
+        edge_v = np.fromiter((index[v] for _, v, _ in edges), dtype=np.int32, count=len(edges))
+        base_times = np.fromiter((value for _, _, value in edges), dtype=np.float32, count=len(edges))
+        return cls(names, nodes, edge_u, edge_v, base_times)
+
+    def to_networkx(self):
+        """
+        Export a networkx view with the node attributes, base travel times and current weights.
+        """
+        graph = nx.Graph()
+        for name, (latitude, longitude, is_hospital) in zip(self.names, self.nodes.tolist()):
+            graph.add_node(name, latitude=latitude, longitude=longitude, is_hospital=is_hospital)
+        for u, v, base, weight in zip(self.edge_u.tolist(), self.edge_v.tolist(), self.base.tolist(),
+                                      self.weights.tolist()):
+            graph.add_edge(self.names[u], self.names[v], base_travel_time=base, weight=weight)
+        return graph
+
+    def edges(self):
+        """
+        Edges as (u, v) name pairs, in edge id order.
+        """
+        return [(self.names[u], self.names[v]) for u, v in zip(self.edge_u.tolist(), self.edge_v.tolist())]
+
+    def edge_id(self, u, v):
+        i, j = self.index[u], self.index[v]
+        start, end = self.indptr[i], self.indptr[i + 1]
+        slot = start + np.searchsorted(self.indices[start:end], j)
+        if slot >= end or self.indices[slot] != j:
+            raise KeyError(f"No edge between {u} and {v}.")
+        return int(self.slot_edge[slot])
+
+    def weight(self, u, v, data=None):
+        """
+        Weight function with the networkx (u, v, data) signature reading the current weight array.
+        """
+        return float(self.weights[self.edge_id(u, v)])
+
+    def set_weights(self, weights, version=None):
+        """
+        Replace every edge weight at once. Queries already running keep the previous array.
+        """
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.version = (self.version or 0) + 1 if version is None else version
+
+    def apply_factors(self, traffic, weather, version=None):
+        """
+        Vectorized weight update: base time scaled by each edge's traffic ratio plus its weather
+        factor (both arrays in edge id order).
+        """
+        self.set_weights(self.base * (np.asarray(traffic) + np.asarray(weather)), version)
+
+    def weights_from(self, weight):
+        """
+        Evaluate a (u, v, data) weight function, e.g. a WeightSnapshot's, for every edge.
+        """
+        return np.fromiter(
+            (weight(u, v, {'base_travel_time': base}) for (u, v), base in zip(self.edges(), self.base.tolist())),
+            dtype=np.float32, count=len(self.base),
+        )
+
+    def nearest_targets(self, source, targets, k=None, heuristic=None):
+        """
+        Same contract as routing.nearest_targets, run over the CSR arrays. With a heuristic (a
+        consistent lower bound taking a node id) the search is A* with the stopping rule of
+        routing.astar_targets.
+        """
+        if source not in self.index:
+            raise ValueError(f"Source {source} is not in the graph.")
+        indptr, indices, slot_weights = self._adjacency_lists()
+
+        remaining = {self.index[target] for target in targets if target in self.index}
+        if k is None:
+            k = len(remaining)
+        start = self.index[source]
+        if heuristic is not None:
+            return self._astar(start, remaining, k, heuristic, indptr, indices, slot_weights)
+        distances = {}
+        predecessors = {start: None}
+        settled = set()
+        best = {start: 0.0}
+        tie = count()
+        heap = [(0.0, next(tie), start)]
+
+        while heap and len(distances) < k:
+            dist, _, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled.add(node)
+            if node in remaining:
+                distances[node] = dist
+
+            for slot in range(indptr[node], indptr[node + 1]):
+                neighbor = indices[slot]
+                if neighbor in settled:
+                    continue
+                new_dist = dist + slot_weights[slot]
+                if new_dist < best.get(neighbor, float('inf')):
+                    best[neighbor] = new_dist
+                    predecessors[neighbor] = node
+                    heapq.heappush(heap, (new_dist, next(tie), neighbor))
+
+        names = self.names
+        distances = {names[node]: dist for node, dist in distances.items()}
+        return distances, CSRPaths(predecessors, distances, self)
+
+    def _astar(self, start, remaining, k, heuristic, indptr, indices, slot_weights):
+        found = []
+        predecessors = {start: None}
+        settled = set()
+        best = {start: 0.0}
+        tie = count()
+        heap = [(heuristic(start), next(tie), 0.0, start)]
+
+        while heap and k:
+            f, _, dist, node = heap[0]
+            if len(found) >= k and found[k - 1][0] <= f:
+                break
+            heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled.add(node)
+            if node in remaining:
+                found.append((dist, node))
+                found.sort()
+
+            for slot in range(indptr[node], indptr[node + 1]):
+                neighbor = indices[slot]
+                if neighbor in settled:
+                    continue
+                new_dist = dist + slot_weights[slot]
+                if new_dist < best.get(neighbor, float('inf')):
+                    best[neighbor] = new_dist
+                    predecessors[neighbor] = node
+                    heapq.heappush(heap, (new_dist + heuristic(neighbor), next(tie), new_dist, neighbor))
+
+        names = self.names
+        distances = {names[node]: dist for dist, node in found[:k]}
+        return distances, CSRPaths(predecessors, distances, self)
+
+    def _adjacency_lists(self):
+        # Python lists index several times faster than numpy scalars inside the search loop,
+        # so a list view is cached once per weight array
+        adjacency = self._adjacency
+        weights = self.weights
+        if adjacency is None or adjacency[0] is not weights:
+            adjacency = (weights, self.indptr.tolist(), self.indices.tolist(), weights[self.slot_edge].tolist())
+            self._adjacency = adjacency
+        return adjacency[1:]
+
+
+class CSRPaths(LazyPaths):
+    """
+    LazyPaths over a predecessor map of CSR node ids, keyed and returned by node name.
+    """
+
+    def __init__(self, predecessors, targets, csr_graph):
+        super().__init__(predecessors, targets)
+        self.csr_graph = csr_graph
+
+    def _build(self, target):
+        names = self.csr_graph.names
+        return [names[step] for step in build_path(self.predecessors, self.csr_graph.index[target])]
@@ -0,0 +1,232 @@
+import json
+import threading
+
+DEFAULT_CREDENTIALS = "/home/anirudh/Blood_reaper/blood-reaper-f7580-firebase-adminsdk-dwyff-21dae7f7ea.json"
+DEFAULT_DATABASE_URL = "https://blood-reaper-f7580-default-rtdb.firebaseio.com"
+
+_firebase_lock = threading.Lock()
+
+
+class Location:
+    """
+    Latitude/longitude stored as a Firestore GeoPoint, or as a {latitude, longitude} map in dry runs.
+    """
+
+    def __init__(self, latitude, longitude):
+        self.latitude = latitude
+        self.longitude = longitude
+
+
+class Reference:
+    """
+    Path to another document, stored as a Firestore DocumentReference, or as the path string in dry runs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @property
+    def id(self):
+        return self.path.rsplit('/', 1)[-1]
+
+
+def firebase_app(credentials_path=DEFAULT_CREDENTIALS, options=None):
+    """
+    The default Firebase app, initialized on first use. firebase_admin is only imported here, so
+    code that never touches Firebase never pays for loading it.
+    """
+    import firebase_admin
+    from firebase_admin import credentials
+
+    with _firebase_lock:
+        try:
+            return firebase_admin.get_app()
+        except ValueError:
+            return firebase_admin.initialize_app(credentials.Certificate(credentials_path), options)
+
+
+class FirestoreSource:
+    """
+    Firestore documents, with the client created on first access. Exposes the part of the Firestore
+    client the rest of the code uses: collection(), document(), get_all() and batch().
+    """
+
+    def __init__(self, credentials_path=DEFAULT_CREDENTIALS):
+        self.credentials_path = credentials_path
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from firebase_admin import firestore
+
+            self._client = firestore.client(firebase_app(self.credentials_path))
+        return self._client
+
+    def collection(self, name):
+        return self.client.collection(name)
+
+    def document(self, path):
+        return self.client.document(path)
+
+    def get_all(self, references):
+        return self.client.get_all(references)
+
+    def batch(self):
+        return self.client.batch()
+
+
+class LocalSource:
+    """
+    Firestore-shaped documents read from a JSONL file in the format bulk_seed.py --dry-run writes:
+    one {"collection", "id", "data"} object per line. Locations become objects with latitude and
+    longitude and requirement hospitals become references, as Firestore would return them, so the
+    network view, the matching service and a migration dry run work unchanged on local data.
+    Writes are not supported.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.collections = {}
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                data = record['data']
+                location = data.get('location')
+                if isinstance(location, dict):
+                    data['location'] = Location(location['latitude'], location['longitude'])
+                elif isinstance(location, (list, tuple)):
+                    data['location'] = Location(*location)
+                if isinstance(data.get('hospital'), str):
+                    data['hospital'] = Reference(data['hospital'])
+                self.collections.setdefault(record['collection'], {})[record['id']] = data
+
+    def collection(self, name):
+        return LocalQuery(name, self.collections.setdefault(name, {}))
+
+    def document(self, path):
+        collection, doc_id = path.rsplit('/', 1)
+        return self.collection(collection).document(doc_id)
+
+    def get_all(self, references):
+        return [reference.get() for reference in references]
+
+
+class LocalSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return None if self._data is None else dict(self._data)
+
+
+class LocalDocument:
+    def __init__(self, documents, doc_id):
+        self.id = doc_id
+        self._documents = documents
+
+    def get(self):
+        return LocalSnapshot(self.id, self._documents.get(self.id))
+
+
+class LocalChange:
+    def __init__(self, snapshot):
+        self.type = LocalChangeType()
+        self.document = snapshot
+
+
+class LocalChangeType:
+    name = 'ADDED'
+
+
+class LocalWatch:
+    def unsubscribe(self):
+        pass
+
+
+class LocalQuery:
+    """
+    A collection or query over local documents, ordered by document id.
+    """
+
+    def __init__(self, name, documents, limit=None, after=None):
+        self.name = name
+        self._documents = documents
+        self._limit = limit
+        self._after = after
+
+    def document(self, doc_id):
+        return LocalDocument(self._documents, doc_id)
+
+    def order_by(self, field):
+        if field != '__name__':
+            raise ValueError("Local sources can only be ordered by document id.")
+        return self
+
+    def limit(self, count):
+        return LocalQuery(self.name, self._documents, count, self._after)
+
+    def start_after(self, snapshot):
+        return LocalQuery(self.name, self._documents, self._limit, snapshot.id)
+
+    def stream(self):
+        ids = sorted(doc_id for doc_id in self._documents if self._after is None or doc_id > self._after)
+        return iter([LocalSnapshot(doc_id, self._documents[doc_id]) for doc_id in ids[:self._limit]])
+
+    def get(self):
+        return list(self.stream())
+
+    def on_snapshot(self, callback):
+        """
+        Deliver every document once as ADDED, like the initial snapshot of a Firestore listener.
+        """
+        snapshots = list(self.stream())
+        callback(snapshots, [LocalChange(snapshot) for snapshot in snapshots], None)
+        return LocalWatch()
+
+
+class RealtimeDatabaseSource:
+    """
+    Firebase Realtime Database tree, initialized on first read. get(path) returns the value at a path.
+    """
+
+    def __init__(self, credentials_path=DEFAULT_CREDENTIALS, database_url=DEFAULT_DATABASE_URL):
+        self.credentials_path = credentials_path
+        self.database_url = database_url
+
+    def get(self, path='/'):
+        from firebase_admin import db
+
+        firebase_app(self.credentials_path, {'databaseURL': self.database_url})
+        return db.reference(path).get()
+
+
+class JSONTreeSource:
+    """
+    Realtime Database export (the JSON file the Firebase console downloads) read from disk.
+    """
+
+    def __init__(self, path):
+        with open(path) as f:
+            self.tree = json.load(f)
+
+    def get(self, path='/'):
+        value = self.tree
+        for key in filter(None, path.split('/')):
+            if not isinstance(value, dict) or key not in value:
+                return None
+            value = value[key]
+        return value
+
+
+def open_source(location=None, credentials_path=DEFAULT_CREDENTIALS):
+    """
+    Firestore-shaped source for a location: a .jsonl file is read locally, anything else is Firestore.
+    """
+    if location and location.endswith('.jsonl'):
+        return LocalSource(location)
+    return FirestoreSource(credentials_path)
@@ -0,0 +1,119 @@
+import networkx as nx
+
+from routing import nearest_targets
+
+COST_SCALE = 1000  # network simplex works on integers, so travel times are scaled before solving
+
+
+def distance_table(graph, hospitals, banks, search=None, weight='weight'):
+    """
+    Travel times between every hospital and every bank, as (distances, path) where
+    distances[hospital][bank] is the travel time and path(hospital, bank) the route.
+
+    Runs one search per source from whichever side is smaller. On an undirected graph a
+    search from each bank reaches the same hospitals, so when there are fewer banks the
+    banks are the sources and their paths are reversed. search(source, targets) returns
+    (distances, paths) like routing.nearest_targets, which is the default; pass the
+    optimizer's nearest_banks to reuse its CSR arrays and shortest-path-tree cache.
+    """
+    if search is None:
+        search = lambda source, targets: nearest_targets(graph, source, targets, weight=weight)
+    hospitals, banks = list(hospitals), list(banks)
+    from_banks = not graph.is_directed() and len(banks) < len(hospitals)
+    sources, targets = (banks, hospitals) if from_banks else (hospitals, banks)
+    found = {source: search(source, targets) for source in sources}
+
+    distances = {hospital: {} for hospital in hospitals}
+    for source, (reached, _) in found.items():
+        for target, distance in reached.items():
+            if from_banks:
+                distances[target][source] = distance
+            else:
+                distances[source][target] = distance
+
+    def path(hospital, bank):
+        if from_banks:
+            return found[bank][1][hospital][::-1]
+        return found[hospital][1][bank]
+
+    return distances, path
+
+
+def solve_transportation(requests, stock, costs):
+    """
+    Allocate bank stock to requests jointly with a min-cost flow per blood type.
+
+    requests maps request_id -> (hospital, {blood_type: units}), stock maps bank ->
+    {blood_type: units} and costs[hospital][bank] is the travel time. Unreachable pairs are
+    simply absent from costs. Returns (allocations, shortfall): allocations is a list of
+    (request_id, bank, blood_type, units) and shortfall maps request_id -> {blood_type: units}.
+    """
+    allocations = []
+    shortfall = {}
+    blood_types = {blood_type for _, demand in requests.values() for blood_type in demand}
+
+    for blood_type in blood_types:
+        flow_graph = nx.DiGraph()
+        wanted = {rid: demand.get(blood_type, 0) for rid, (_, demand) in requests.items() if demand.get(blood_type, 0) > 0}
+        offered = {bank: units.get(blood_type, 0) for bank, units in stock.items() if units.get(blood_type, 0) > 0}
+        total_wanted, total_offered = sum(wanted.values()), sum(offered.values())
+
+        for rid, units in wanted.items():
+            flow_graph.add_node(('request', rid), demand=units)
+        for bank, units in offered.items():
+            flow_graph.add_node(('bank', bank), demand=-units)
+            flow_graph.add_edge(('bank', bank), 'surplus', weight=0)
+            for rid in wanted:
+                hospital = requests[rid][0]
+                if bank in costs.get(hospital, {}):
+                    flow_graph.add_edge(('bank', bank), ('request', rid),
+                                        weight=int(round(costs[hospital][bank] * COST_SCALE)))
+
+        # Unmet demand is drawn from a shortage node. One unit of it costs more than any complete
+        # assignment, so the flow never leaves a request short to make the routes cheaper.
+        max_cost = max((data['weight'] for _, _, data in flow_graph.edges(data=True)), default=0)
+        shortage_cost = max_cost * total_wanted + 1
+        flow_graph.add_node('shortage', demand=-total_wanted)
+        for rid in wanted:
+            flow_graph.add_edge('shortage', ('request', rid), weight=shortage_cost)
+        flow_graph.add_edge('shortage', 'surplus', weight=0)
+        flow_graph.add_node('surplus', demand=total_offered)
+
+        flow = nx.min_cost_flow(flow_graph)
+        for source, sinks in flow.items():
+            for sink, units in sinks.items():
+                if units <= 0 or sink == 'surplus':
+                    continue
+                rid = sink[1]
+                if source == 'shortage':
+                    shortfall.setdefault(rid, {})[blood_type] = units
+                else:
+                    allocations.append((rid, source[1], blood_type, units))
+
+    return allocations, shortfall
+
+
+def plan_batch(graph, requests, stock, weight='weight', search=None):
+    """
+    Solve a batch of requests jointly: a distance table between the involved hospitals and
+    the stocked banks (see distance_table for search), then a transportation problem over
+    the banks' stock.
+
+    Returns (assignments, shortfall) where assignments maps request_id to a list of dicts
+    with bank, blood_type, units, path and travel_time.
+    """
+    hospitals = list(dict.fromkeys(hospital for hospital, _ in requests.values()))
+    distances, path = distance_table(graph, hospitals, stock, search=search, weight=weight)
+    allocations, shortfall = solve_transportation(requests, stock, distances)
+
+    assignments = {rid: [] for rid in requests}
+    for rid, bank, blood_type, units in allocations:
+        hospital = requests[rid][0]
+        assignments[rid].append({
+            'bank': bank,
+            'blood_type': blood_type,
+            'units': units,
+            'path': path(hospital, bank),
+            'travel_time': distances[hospital][bank],
+        })
+    return assignments, shortfall
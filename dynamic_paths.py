@@ -0,0 +1,210 @@
+import heapq
+import threading
+from collections import OrderedDict
+from itertools import count
+
+from routing import LazyPaths, build_path, weight_function
+
+
+class ShortestPathTree:
+    """
+    Full shortest-path tree from one source: distances, predecessors and the children of every node.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.distances = {source: 0}
+        self.predecessors = {source: None}
+        self.children = {source: set()}
+
+    def set_parent(self, node, parent):
+        old = self.predecessors.get(node)
+        if old is not None:
+            self.children[old].discard(node)
+        self.predecessors[node] = parent
+        self.children.setdefault(node, set())
+        if parent is not None:
+            self.children.setdefault(parent, set()).add(node)
+
+    def subtree(self, root):
+        """
+        Every node whose tree path passes through root, root included.
+        """
+        nodes = [root]
+        for node in nodes:
+            nodes.extend(self.children.get(node, ()))
+        return nodes
+
+
+class TreePaths(LazyPaths):
+    """
+    LazyPaths read from a cached tree under the cache lock. A path read after the tree was repaired
+    follows the repaired tree, so it is the current shortest path rather than the one at lookup time.
+    """
+
+    def __init__(self, tree, targets, lock):
+        super().__init__(tree.predecessors, targets)
+        self.lock = lock
+
+    def _build(self, target):
+        with self.lock:
+            return build_path(self.predecessors, target)
+
+
+class ShortestPathTreeCache:
+    """
+    Keep shortest-path trees for the most frequently queried sources and repair them in place
+    when a few edge weights change.
+
+    A source gets a tree once it has been queried min_queries times; after that, nearest-target
+    queries are answered by sorting the targets by their stored distance, with no search at all.
+    At most max_trees trees are kept, least recently used first out.
+
+    update() follows the Ramalingam-Reps scheme: for an edge that got more expensive, only the
+    subtree hanging below it in a tree can lose its distances, so those nodes are reset and
+    re-seeded from their unaffected neighbours; for an edge that got cheaper, its far endpoint
+    is relaxed. A Dijkstra pass seeded with just those nodes then restores every distance, so
+    the work is proportional to the part of the tree that actually changed. Repairs only pay
+    off for sparse changes: once more than repair_fraction of the edges changed, as after a
+    live traffic refresh, the trees are rebuilt from scratch instead.
+    """
+
+    def __init__(self, graph, weight='weight', max_trees=16, min_queries=2, repair_fraction=0.02):
+        self.graph = graph
+        self.max_trees = max_trees
+        self.min_queries = min_queries
+        self.repair_fraction = repair_fraction
+        self.version = None
+        self._weight = weight_function(weight)
+        self._trees = OrderedDict()
+        self._queries = {}
+        self._snapshot_weights = None
+        self._lock = threading.Lock()
+
+    def lookup(self, source, targets, k=None):
+        """
+        Answer a nearest-targets query from a cached tree, building the tree if the source has become
+        frequent. Returns (distances, paths) like routing.nearest_targets, or None for a cold source.
+        """
+        with self._lock:
+            tree = self._trees.get(source)
+            if tree is None:
+                self._queries[source] = self._queries.get(source, 0) + 1
+                if self._queries[source] < self.min_queries or source not in self.graph:
+                    return None
+                tree = self._build(source)
+                self._trees[source] = tree
+                if len(self._trees) > self.max_trees:
+                    self._trees.popitem(last=False)
+            self._trees.move_to_end(source)
+
+            reachable = sorted((tree.distances[target], target) for target in set(targets) if target in tree.distances)
+            if k is not None:
+                reachable = reachable[:k]
+            distances = {target: dist for dist, target in reachable}
+            return distances, TreePaths(tree, distances, self._lock)
+
+    def update(self, changed_edges, weight=None, version=None):
+        """
+        Repair every cached tree after the given edges changed weight, or rebuild it when more than
+        repair_fraction of the edges changed. Pass changed_edges=None when the changes are unknown
+        (e.g. the graph itself was edited), which drops all trees instead.
+        """
+        with self._lock:
+            if weight is not None:
+                self._weight = weight_function(weight)
+            self.version = version
+            if changed_edges is None:
+                self._trees.clear()
+                return
+            changed_edges = [(u, v) for u, v in changed_edges if self.graph.has_edge(u, v)]
+            if len(changed_edges) > self.repair_fraction * self.graph.number_of_edges():
+                for source in self._trees:
+                    self._trees[source] = self._build(source)
+            elif changed_edges:
+                for tree in self._trees.values():
+                    self._repair(tree, changed_edges)
+
+    def sync_snapshot(self, snapshot):
+        """
+        Follow a background WeightSnapshot: on a new version, repair the trees for the edges whose
+        weight differs from the last snapshot seen.
+        """
+        if snapshot.version == self.version:
+            return
+        previous = self._snapshot_weights
+        if previous is None:
+            changed = None
+        else:
+            changed = [edge for edge, weight in snapshot.weights.items() if previous.get(edge) != weight]
+        self._snapshot_weights = snapshot.weights
+        self.update(changed, snapshot.weight, snapshot.version)
+
+    def __contains__(self, source):
+        return source in self._trees
+
+    def _build(self, source):
+        tree = ShortestPathTree(source)
+        tie = count()
+        self._propagate(tree, [(0, next(tie), source)], tie)
+        return tree
+
+    def _repair(self, tree, changed_edges):
+        distances = tree.distances
+        inf = float('inf')
+
+        # Edges that are now more expensive than their tree link orphan the subtree below them
+        affected = set()
+        for u, v in changed_edges:
+            for parent, child in ((u, v), (v, u)):
+                if tree.predecessors.get(child) == parent and child not in affected:
+                    if distances[parent] + self._edge_weight(parent, child) > distances[child]:
+                        affected.update(tree.subtree(child))
+        for node in affected:
+            del distances[node]
+            tree.set_parent(node, None)
+
+        tie = count()
+        heap = []
+        for node in affected:
+            best, parent = inf, None
+            for neighbor in self.graph[node]:
+                if neighbor in distances:
+                    candidate = distances[neighbor] + self._edge_weight(neighbor, node)
+                    if candidate < best:
+                        best, parent = candidate, neighbor
+            if parent is None:
+                del tree.predecessors[node]
+            else:
+                distances[node] = best
+                tree.set_parent(node, parent)
+                heapq.heappush(heap, (best, next(tie), node))
+
+        # Edges that are now cheaper may offer a shorter way to either endpoint
+        for u, v in changed_edges:
+            for near, far in ((u, v), (v, u)):
+                if near in distances:
+                    candidate = distances[near] + self._edge_weight(near, far)
+                    if candidate < distances.get(far, inf):
+                        distances[far] = candidate
+                        tree.set_parent(far, near)
+                        heapq.heappush(heap, (candidate, next(tie), far))
+
+        self._propagate(tree, heap, tie)
+
+    def _propagate(self, tree, heap, tie):
+        # Label-correcting Dijkstra: nodes may be pushed more than once, stale entries are skipped
+        distances = tree.distances
+        while heap:
+            dist, _, node = heapq.heappop(heap)
+            if dist > distances.get(node, float('inf')):
+                continue
+            for neighbor, data in self.graph[node].items():
+                candidate = dist + self._weight(node, neighbor, data)
+                if candidate < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = candidate
+                    tree.set_parent(neighbor, node)
+                    heapq.heappush(heap, (candidate, next(tie), neighbor))
+
+    def _edge_weight(self, u, v):
+        return self._weight(u, v, self.graph[u][v])
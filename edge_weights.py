@@ -0,0 +1,321 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+DISTANCE_MATRIX_URL = "https://maps.googleapis.com/maps/api/distancematrix/json"
+WEATHER_URL = "https://api.weather.com/weather"
+
+
+class TTLCache:
+    """
+    Small dict-backed cache whose entries expire ttl seconds after being written.
+    Expired entries are kept so they can still be served while a refresh is pending.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        return entry[0] if entry else default
+
+    def set(self, key, value):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+
+    def is_fresh(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > time.monotonic()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class EdgeWeightRefresher:
+    """
+    Fetch traffic and weather factors for graph edges in batches and cache them.
+
+    Traffic durations are requested through the Distance Matrix batch form, several
+    origins and destinations per call, and weather is requested once per grid cell
+    rather than once per edge. Factors stay cached for ttl seconds, so refreshing a
+    graph whose factors are still fresh makes no network calls at all. With a history
+    (TrafficProfiles), every fetched duration is also recorded against its time of day.
+
+    Traffic is cached in the same unit the history uses, the live duration divided by the
+    edge's base travel time, and an edge weighs base_time * (traffic ratio + weather factor),
+    in minutes like TrafficProfiles.edge_cost. Edges without live traffic have a ratio of 1.
+    """
+
+    def __init__(self, traffic_api_key, weather_api_key, ttl=300, batch_size=10, grid_precision=2,
+                 max_workers=4, session=None, traffic_url=DISTANCE_MATRIX_URL, weather_url=WEATHER_URL,
+                 history=None):
+        self.traffic_api_key = traffic_api_key
+        self.weather_api_key = weather_api_key
+        self.batch_size = batch_size
+        self.grid_precision = grid_precision
+        self.max_workers = max_workers
+        self.traffic_url = traffic_url
+        self.weather_url = weather_url
+        self.traffic_cache = TTLCache(ttl)
+        self.weather_cache = TTLCache(ttl)
+        self.history = history
+
+        # Factors mirrored into arrays indexed by the edge ids of one CSR graph (see factor_arrays)
+        self._array_lock = threading.Lock()
+        self._csr_graph = None
+        self._edge_ids = {}
+        self._cell_ids = {}
+        self._traffic = None
+        self._weather = None
+        self._edge_cells = None
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+    def grid_cell(self, latitude, longitude):
+        """
+        Snap a coordinate to the weather grid cell that contains it.
+        """
+        return round(float(latitude), self.grid_precision), round(float(longitude), self.grid_precision)
+
+    def refresh(self, graph):
+        """
+        Fetch every expired traffic and weather factor for the edges of the graph.
+        """
+        stale_edges = [(u, v) for u, v in self._located_edges(graph) if not self.traffic_cache.is_fresh((u, v))]
+        stale_cells = {}
+        for u, _ in self._located_edges(graph):
+            cell = self.grid_cell(graph.nodes[u]['latitude'], graph.nodes[u]['longitude'])
+            if not self.weather_cache.is_fresh(cell):
+                stale_cells[cell] = u
+
+        jobs = [(self._fetch_traffic_batch, graph, batch) for batch in self._traffic_batches(stale_edges)]
+        jobs += [(self._fetch_weather, cell) for cell in stale_cells]
+        if not jobs:
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(job[0], *job[1:]) for job in jobs]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(f"Error refreshing edge weights: {e}")
+
+    def apply(self, graph):
+        """
+        Write weights for every edge of the graph from the cached factors.
+        """
+        for u, v, data in graph.edges(data=True):
+            if 'latitude' in graph.nodes[u] and 'latitude' in graph.nodes[v]:
+                data['weight'] = self.edge_weight(graph, u, v, data['base_travel_time'])
+            else:
+                logging.warning(f"Skipping edge ({u}, {v}) due to missing latitude/longitude data.")
+
+    def edge_weight(self, graph, u, v, base_time):
+        """
+        Combine the base travel time of an edge with its cached traffic and weather factors.
+        """
+        traffic_ratio = self.traffic_cache.get((u, v), 1.0)
+        cell = self.grid_cell(graph.nodes[u]['latitude'], graph.nodes[u]['longitude'])
+        weather_factor = self.weather_cache.get(cell, 0)
+        return base_time * (traffic_ratio + weather_factor)
+
+    def factor_arrays(self, csr_graph):
+        """
+        Cached factors laid out for CSRGraph.apply_factors: traffic ratio and weather factor per edge.
+        Edges with an endpoint lacking coordinates keep their base time, as in edge_weight().
+
+        The arrays are filled from the caches once per CSR graph and then updated in place by every
+        fetch, so each call is an array copy and a gather rather than a walk over the edges.
+        """
+        with self._array_lock:
+            if self._csr_graph is not csr_graph:
+                self._bind(csr_graph)
+            return self._traffic.copy(), self._weather[self._edge_cells]
+
+    def _bind(self, csr_graph):
+        edges = csr_graph.edges()
+        self._edge_ids = {edge: i for i, edge in enumerate(edges)}
+        self._traffic = np.fromiter((self.traffic_cache.get(edge, 1.0) for edge in edges),
+                                    dtype=np.float32, count=len(edges))
+
+        # One slot per weather cell, plus a last slot that stays 0 for edges without coordinates
+        node_cells = []
+        for latitude, longitude in zip(csr_graph.nodes['latitude'].tolist(), csr_graph.nodes['longitude'].tolist()):
+            if latitude == latitude and longitude == longitude:
+                cell = self.grid_cell(latitude, longitude)
+                node_cells.append(self._cell_ids.setdefault(cell, len(self._cell_ids)))
+            else:
+                node_cells.append(-1)
+        node_cells = np.array(node_cells, dtype=np.int64)
+        self._weather = np.zeros(len(self._cell_ids) + 1, dtype=np.float32)
+        for cell, i in self._cell_ids.items():
+            self._weather[i] = self.weather_cache.get(cell, 0)
+        located = (node_cells[csr_graph.edge_u] >= 0) & (node_cells[csr_graph.edge_v] >= 0)
+        self._edge_cells = np.where(located, node_cells[csr_graph.edge_u], len(self._cell_ids))
+        self._csr_graph = csr_graph
+
+    def _set_traffic(self, edge, ratio):
+        self.traffic_cache.set(edge, ratio)
+        with self._array_lock:
+            edge_id = self._edge_ids.get(edge)
+            if edge_id is not None:
+                self._traffic[edge_id] = ratio
+
+    def _set_weather(self, cell, factor):
+        self.weather_cache.set(cell, factor)
+        with self._array_lock:
+            cell_id = self._cell_ids.get(cell)
+            if cell_id is not None:
+                self._weather[cell_id] = factor
+
+    def _located_edges(self, graph):
+        for u, v in graph.edges():
+            if 'latitude' in graph.nodes[u] and 'latitude' in graph.nodes[v]:
+                yield u, v
+
+    def _traffic_batches(self, edges):
+        """
+        Group edges by origin and tile them into origins x destinations blocks of at most batch_size each.
+        """
+        by_origin = {}
+        for u, v in edges:
+            by_origin.setdefault(u, []).append(v)
+
+        origins = list(by_origin)
+        for i in range(0, len(origins), self.batch_size):
+            origin_block = origins[i:i + self.batch_size]
+            destinations = list(dict.fromkeys(v for u in origin_block for v in by_origin[u]))
+            for j in range(0, len(destinations), self.batch_size):
+                destination_block = destinations[j:j + self.batch_size]
+                wanted = {(u, v) for u in origin_block for v in by_origin[u] if v in destination_block}
+                yield origin_block, destination_block, wanted
+
+    def _fetch_traffic_batch(self, graph, batch):
+        origin_block, destination_block, wanted = batch
+        params = {
+            'origins': '|'.join(self._coordinates(graph, u) for u in origin_block),
+            'destinations': '|'.join(self._coordinates(graph, v) for v in destination_block),
+            'key': self.traffic_api_key,
+        }
+        response = self.session.get(self.traffic_url, params=params)
+        response.raise_for_status()
+        rows = response.json()['rows']
+        fetched_at = time.time()
+
+        for i, u in enumerate(origin_block):
+            for j, v in enumerate(destination_block):
+                if (u, v) not in wanted:
+                    continue
+                try:
+                    duration = rows[i]['elements'][j]['duration']['value']
+                except (IndexError, KeyError) as e:
+                    logging.error(f"Error fetching traffic data between {u} and {v}: {e}")
+                    continue
+                base_time = graph[u][v].get('base_travel_time')
+                if not base_time:
+                    logging.warning(f"Skipping traffic data between {u} and {v}: no base travel time.")
+                    continue
+                ratio = duration / 60.0 / base_time  # Live minutes over base minutes
+                self._set_traffic((u, v), ratio)
+                if self.history is not None:
+                    self.history.observe(u, v, fetched_at, ratio)
+
+    def _fetch_weather(self, cell):
+        latitude, longitude = cell
+        params = {'lat': latitude, 'lon': longitude, 'key': self.weather_api_key}
+        response = self.session.get(self.weather_url, params=params)
+        response.raise_for_status()
+        self._set_weather(cell, response.json().get('weather_factor', 0))  # Default to 0 if no data available
+
+    def _coordinates(self, graph, node):
+        return f"{graph.nodes[node]['latitude']},{graph.nodes[node]['longitude']}"
+
+
+class WeightSnapshot:
+    """
+    Immutable, versioned set of edge weights published by the background refresher.
+    """
+
+    def __init__(self, version, weights):
+        self.version = version
+        self.weights = weights
+        self.created_at = time.monotonic()
+
+    def weight(self, u, v, data):
+        """
+        Weight function for routing; edges added after the snapshot was taken fall back to their base time.
+        """
+        weight = self.weights.get((u, v))
+        if weight is None:
+            weight = self.weights.get((v, u), data.get('base_travel_time', 1))
+        return weight
+
+
+class BackgroundWeightRefresher(threading.Thread):
+    """
+    Refresh edge weights on a fixed interval on a daemon thread.
+
+    Each refresh builds a complete new WeightSnapshot while readers keep using the
+    previous one, then publishes it with a single reference assignment. Routing
+    queries read the current snapshot without taking any lock and never wait for
+    the network. on_publish(snapshot), when given, runs on this thread just before a
+    snapshot is published, so structures derived from the weights are brought up to
+    date here rather than by the first query that sees the new version.
+    """
+
+    def __init__(self, graph, refresher, interval=60, on_publish=None):
+        super().__init__(daemon=True)
+        self.graph = graph
+        self.refresher = refresher
+        self.interval = interval
+        self.on_publish = on_publish
+        self._stop_event = threading.Event()
+        self._snapshot = self._build_snapshot(0)
+
+    def current(self):
+        """
+        Return the latest published snapshot.
+        """
+        return self._snapshot
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.refresh_once()
+            self._stop_event.wait(self.interval)
+
+    def refresh_once(self):
+        """
+        Fetch expired factors and publish a new snapshot.
+        """
+        try:
+            self.refresher.refresh(self.graph)
+            snapshot = self._build_snapshot(self._snapshot.version + 1)
+            if self.on_publish is not None:
+                self.on_publish(snapshot)
+            self._snapshot = snapshot
+        except Exception as e:
+            logging.error(f"Background weight refresh failed, keeping version {self._snapshot.version}: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _build_snapshot(self, version):
+        weights = {}
+        for u, v, base_time in list(self.graph.edges(data='base_travel_time')):
+            if 'latitude' in self.graph.nodes[u] and 'latitude' in self.graph.nodes[v]:
+                weights[(u, v)] = self.refresher.edge_weight(self.graph, u, v, base_time)
+        return WeightSnapshot(version, weights)
@@ -0,0 +1,66 @@
+def _coverable(demand, stock):
+    return sum(min(units, stock.get(blood_type, 0)) for blood_type, units in demand.items())
+
+
+def _take(demand, stock):
+    taken = {}
+    for blood_type, units in demand.items():
+        amount = min(units, stock.get(blood_type, 0))
+        if amount > 0:
+            taken[blood_type] = amount
+    return taken
+
+
+def plan_fulfilment(demand, travel_times, stock):
+    """
+    Split a multi-type demand ({blood_type: units}) across several banks.
+
+    travel_times maps each candidate bank to its travel time from the hospital and stock
+    maps it to {blood_type: units available}. Every bank used costs one trip, so banks are
+    chosen greedily by travel time per unit they can still cover; a repair pass then drops
+    any chosen bank whose units the other chosen banks can absorb, most expensive first.
+
+    Returns (pickups, shortfall): pickups is a list of (bank, {blood_type: units}) ordered by
+    travel time, and shortfall holds whatever demand no candidate bank could cover.
+    """
+    remaining = {blood_type: units for blood_type, units in demand.items() if units > 0}
+    chosen = []
+    candidates = set(travel_times)
+
+    while remaining and candidates:
+        def cost_per_unit(bank):
+            covered = _coverable(remaining, stock[bank])
+            return travel_times[bank] / covered if covered else float('inf')
+
+        bank = min(candidates, key=lambda b: (cost_per_unit(b), travel_times[b]))
+        if cost_per_unit(bank) == float('inf'):
+            break
+        candidates.discard(bank)
+        chosen.append(bank)
+        for blood_type, amount in _take(remaining, stock[bank]).items():
+            remaining[blood_type] -= amount
+            if remaining[blood_type] == 0:
+                del remaining[blood_type]
+
+    # Repair: try to drop the most expensive banks while the rest still cover what was planned
+    planned = {blood_type: units - remaining.get(blood_type, 0) for blood_type, units in demand.items()}
+    for bank in sorted(chosen, key=lambda b: travel_times[b], reverse=True):
+        others = [b for b in chosen if b != bank]
+        if others and all(
+            sum(stock[b].get(blood_type, 0) for b in others) >= units for blood_type, units in planned.items()
+        ):
+            chosen = others
+
+    # Assign units to the final banks, nearest first
+    chosen.sort(key=lambda b: travel_times[b])
+    still_needed = {blood_type: units for blood_type, units in planned.items() if units > 0}
+    pickups = []
+    for bank in chosen:
+        taken = _take(still_needed, stock[bank])
+        if not taken:
+            continue
+        for blood_type, amount in taken.items():
+            still_needed[blood_type] -= amount
+        pickups.append((bank, taken))
+
+    return pickups, remaining
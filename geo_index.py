@@ -0,0 +1,339 @@
+import heapq
+
+import numpy as np
+
+from haversine import EARTH_RADIUS_M, haversine_matrix, to_unit_vectors
+
+GRAPH_MODES = ('complete', 'knn', 'radius')
+
+
+def chord_to_meters(chord):
+    """
+    Convert a straight-line distance between unit vectors to a great-circle distance in meters.
+    """
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+def meters_to_chord(meters):
+    """
+    Convert a great-circle distance in meters to the equivalent unit-sphere chord length.
+    """
+    return 2 * np.sin(np.minimum(np.asarray(meters, dtype=np.float64) / EARTH_RADIUS_M, np.pi) / 2)
+
+
+class GeoIndex:
+    """
+    k-d tree over locations projected onto the unit sphere.
+
+    Chord length between unit vectors grows monotonically with great-circle distance,
+    so nearest neighbours in 3D are nearest neighbours on the globe. Every point can
+    carry an integer tag bitmask (e.g. which blood types a lab has in stock); each tree
+    node keeps the OR of its points' tags, so a filtered query skips whole subtrees
+    that cannot contain a match.
+    """
+
+    def __init__(self, items, latitudes, longitudes, tags=None, leaf_size=16):
+        self.items = list(items)
+        self.points = to_unit_vectors(latitudes, longitudes).reshape(-1, 3)
+        if tags is None:
+            tags = np.zeros(len(self.items), dtype=np.int64)
+        self.tags = np.asarray(tags, dtype=np.int64)
+        self.leaf_size = leaf_size
+
+        # Flat node arrays: bounding box, point range and children (-1 for leaves)
+        self._order = np.arange(len(self.items))
+        self._lo, self._hi, self._start, self._end = [], [], [], []
+        self._left, self._right, self._node_tags = [], [], []
+        self._parent, self._leaf_of = [], np.zeros(len(self.items), dtype=np.int64)
+        if self.items:
+            self._build(0, len(self.items), -1)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _build(self, start, end, parent):
+        node = len(self._start)
+        indices = self._order[start:end]
+        points = self.points[indices]
+        self._lo.append(points.min(axis=0))
+        self._hi.append(points.max(axis=0))
+        self._start.append(start)
+        self._end.append(end)
+        self._node_tags.append(int(np.bitwise_or.reduce(self.tags[indices])))
+        self._left.append(-1)
+        self._right.append(-1)
+        self._parent.append(parent)
+
+        if end - start > self.leaf_size:
+            axis = int(np.argmax(self._hi[node] - self._lo[node]))
+            mid = (end - start) // 2
+            self._order[start:end] = indices[np.argpartition(points[:, axis], mid)]
+            self._left[node] = self._build(start, start + mid, node)
+            self._right[node] = self._build(start + mid, end, node)
+        else:
+            self._leaf_of[indices] = node
+        return node
+
+    def set_tags(self, position, tags):
+        """
+        Change the tag bitmask of the point at position and refresh the subtree masks above it.
+        """
+        self.tags[position] = tags
+        node = int(self._leaf_of[position])
+        indices = self._order[self._start[node]:self._end[node]]
+        self._node_tags[node] = int(np.bitwise_or.reduce(self.tags[indices]))
+        node = self._parent[node]
+        while node != -1:
+            self._node_tags[node] = self._node_tags[self._left[node]] | self._node_tags[self._right[node]]
+            node = self._parent[node]
+
+    def _box_distance(self, node, point):
+        gap = np.maximum(self._lo[node] - point, 0) + np.maximum(point - self._hi[node], 0)
+        return float(np.sqrt(gap @ gap))
+
+    def _leaf_candidates(self, node, point, require_tags):
+        indices = self._order[self._start[node]:self._end[node]]
+        if require_tags:
+            indices = indices[(self.tags[indices] & require_tags) != 0]
+        diff = self.points[indices] - point
+        return indices, np.sqrt(np.einsum('ij,ij->i', diff, diff))
+
+    def nearest(self, latitude, longitude, k=1, require_tags=0, max_distance=None):
+        """
+        Return up to k (item, distance_in_meters) pairs nearest to the coordinate, closest first.
+        When require_tags is non-zero only points sharing at least one tag bit are considered.
+        """
+        if not self.items or k <= 0:
+            return []
+        point = to_unit_vectors([latitude], [longitude])[0]
+        bound = float(meters_to_chord(max_distance)) if max_distance is not None else np.inf
+
+        best = []  # max-heap of (-chord, index) holding the k best so far
+        queue = [(self._box_distance(0, point), 0)]
+        while queue:
+            box_distance, node = heapq.heappop(queue)
+            limit = -best[0][0] if len(best) == k else bound
+            if box_distance > limit:
+                break
+            if require_tags and not self._node_tags[node] & require_tags:
+                continue
+
+            if self._left[node] == -1:
+                indices, chords = self._leaf_candidates(node, point, require_tags)
+                for index, chord in zip(indices.tolist(), chords.tolist()):
+                    if chord > bound:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-chord, index))
+                    elif chord < -best[0][0]:
+                        heapq.heapreplace(best, (-chord, index))
+            else:
+                for child in (self._left[node], self._right[node]):
+                    heapq.heappush(queue, (self._box_distance(child, point), child))
+
+        best.sort(reverse=True)
+        return [(self.items[index], float(chord_to_meters(-neg_chord))) for neg_chord, index in best]
+
+    def within_radius(self, latitude, longitude, radius, require_tags=0):
+        """
+        Return every (item, distance_in_meters) pair within radius meters of the coordinate, closest first.
+        """
+        if not self.items:
+            return []
+        point = to_unit_vectors([latitude], [longitude])[0]
+        bound = float(meters_to_chord(radius))
+
+        found = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if self._box_distance(node, point) > bound:
+                continue
+            if require_tags and not self._node_tags[node] & require_tags:
+                continue
+            if self._left[node] == -1:
+                indices, chords = self._leaf_candidates(node, point, require_tags)
+                keep = chords <= bound
+                found.extend(zip(chords[keep].tolist(), indices[keep].tolist()))
+            else:
+                stack.extend((self._left[node], self._right[node]))
+
+        found.sort()
+        return [(self.items[index], float(chord_to_meters(chord))) for chord, index in found]
+
+
+class DynamicGeoIndex:
+    """
+    GeoIndex that accepts inserts, removals, moves and tag changes keyed by item id.
+
+    Tag changes are applied to the tree in place. Inserted or moved points go to a small
+    overflow list that is scanned linearly, and removed points are tombstoned; once the
+    overflow and tombstones reach rebuild_fraction of the index, the tree is rebuilt.
+    """
+
+    def __init__(self, rebuild_fraction=0.1, leaf_size=16):
+        self.rebuild_fraction = rebuild_fraction
+        self.leaf_size = leaf_size
+        self._entries = {}  # id -> (latitude, longitude, tags)
+        self._positions = {}  # id -> position in the tree for ids still current there
+        self._overflow = set()
+        self._tree = GeoIndex([], [], [], leaf_size=leaf_size)
+        self._stale = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, item_id):
+        return item_id in self._entries
+
+    def upsert(self, item_id, latitude, longitude, tags=0):
+        previous = self._entries.get(item_id)
+        self._entries[item_id] = (float(latitude), float(longitude), int(tags))
+        position = self._positions.get(item_id)
+        if position is not None and previous[:2] == (float(latitude), float(longitude)):
+            self._tree.set_tags(position, int(tags))
+            return
+        if position is not None:
+            # The tree copy is now stale: hide it and track the moved point in the overflow
+            del self._positions[item_id]
+            self._tree.set_tags(position, 0)
+            self._stale += 1
+        self._overflow.add(item_id)
+        self._maybe_rebuild()
+
+    def remove(self, item_id):
+        if self._entries.pop(item_id, None) is None:
+            return
+        self._overflow.discard(item_id)
+        position = self._positions.pop(item_id, None)
+        if position is not None:
+            self._tree.set_tags(position, 0)
+            self._stale += 1
+        self._maybe_rebuild()
+
+    def nearest(self, latitude, longitude, k=1, require_tags=0, max_distance=None, exclude=()):
+        """
+        Return up to k (item_id, distance_in_meters) pairs nearest to the coordinate, closest first.
+        Without require_tags, stale tree points are skipped by over-fetching from the tree.
+        """
+        exclude = set(exclude)
+        found = [
+            (distance, item_id) for item_id, distance in self._tree.nearest(
+                latitude, longitude, k=k + self._stale + len(exclude), require_tags=require_tags,
+                max_distance=max_distance)
+            if item_id in self._positions and item_id not in exclude
+            and (not require_tags or self._entries[item_id][2] & require_tags)
+        ]
+        overflow = [item_id for item_id in self._overflow if item_id not in exclude
+                    and (not require_tags or self._entries[item_id][2] & require_tags)]
+        if overflow:
+            distances = haversine_matrix([latitude], [longitude],
+                                         [self._entries[item_id][0] for item_id in overflow],
+                                         [self._entries[item_id][1] for item_id in overflow], dtype=np.float64)[0]
+            found.extend((float(distance), item_id) for distance, item_id in zip(distances, overflow)
+                         if max_distance is None or distance <= max_distance)
+        found.sort(key=lambda pair: pair[0])
+        return [(item_id, distance) for distance, item_id in found[:k]]
+
+    def rebuild(self):
+        ids = list(self._entries)
+        self._tree = GeoIndex(ids, [self._entries[i][0] for i in ids], [self._entries[i][1] for i in ids],
+                              tags=[self._entries[i][2] for i in ids], leaf_size=self.leaf_size)
+        self._positions = {item_id: position for position, item_id in enumerate(ids)}
+        self._overflow = set()
+        self._stale = 0
+
+    def _maybe_rebuild(self):
+        if len(self._overflow) + self._stale > max(32, self.rebuild_fraction * len(self._entries)):
+            self.rebuild()
+
+
+def _find(parents, i):
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+def neighbour_edges(latitudes, longitudes, k=5, radius=None):
+    """
+    Sparse, connected set of undirected edges (i, j, meters) between point indices.
+
+    Each point is linked to its k nearest neighbours, or to every point within radius
+    meters when a radius is given. If that leaves the graph disconnected, the closest
+    pair of points between a smaller component and the rest is linked until a single
+    component remains.
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    n = len(latitudes)
+    index = GeoIndex(range(n), latitudes, longitudes)
+
+    edges = {}
+    for i in range(n):
+        if radius is not None:
+            neighbours = index.within_radius(latitudes[i], longitudes[i], radius)
+        else:
+            neighbours = index.nearest(latitudes[i], longitudes[i], k=k + 1)
+        for j, distance in neighbours:
+            if i != j:
+                edges[(min(i, j), max(i, j))] = distance
+
+    parents = list(range(n))
+    for i, j in edges:
+        parents[_find(parents, i)] = _find(parents, j)
+
+    while True:
+        roots = np.array([_find(parents, i) for i in range(n)])
+        components, sizes = np.unique(roots, return_counts=True)
+        if len(components) <= 1:
+            break
+        # Link the smallest component to its nearest outside point; repeat until connected
+        members = np.flatnonzero(roots == components[np.argmin(sizes)])
+        outside = np.flatnonzero(roots != roots[members[0]])
+        distances = haversine_matrix(latitudes[members], longitudes[members],
+                                     latitudes[outside], longitudes[outside], dtype=np.float64)
+        row, col = np.unravel_index(np.argmin(distances), distances.shape)
+        i, j = int(members[row]), int(outside[col])
+        edges[(min(i, j), max(i, j))] = float(distances[row, col])
+        parents[_find(parents, i)] = _find(parents, j)
+
+    return [(i, j, distance) for (i, j), distance in edges.items()]
+
+
+def neighbour_dict(ids, latitudes, longitudes, k=5, radius=None):
+    """
+    Build the dict-of-dicts graph {id: {other_id: meters}} over the sparse neighbour edges.
+    """
+    ids = list(ids)
+    graph = {node_id: {} for node_id in ids}
+    for i, j, distance in neighbour_edges(latitudes, longitudes, k=k, radius=radius):
+        graph[ids[i]][ids[j]] = distance
+        graph[ids[j]][ids[i]] = distance
+    return graph
+
+
+def check_graph_mode(graph_mode, radius=None):
+    """
+    Raise ValueError unless graph_mode is one of GRAPH_MODES, with a radius for 'radius'.
+    """
+    if graph_mode not in GRAPH_MODES:
+        raise ValueError(f"Unknown graph mode {graph_mode}, expected 'complete', 'knn' or 'radius'.")
+    if graph_mode == 'radius' and radius is None:
+        raise ValueError("A radius in meters is required for graph mode 'radius'.")
+
+
+def candidate_edges(graph, graph_mode='complete', k=5, radius=None):
+    """
+    List the node pairs of a networkx graph to connect according to graph_mode: every unordered
+    pair for 'complete', or the k nearest neighbours / neighbours within radius meters for
+    'knn' / 'radius'. The sparse modes always yield a connected graph.
+    """
+    nodes = list(graph.nodes)
+    if graph_mode == 'complete':
+        return [(u, v) for i, u in enumerate(nodes) for v in nodes[i + 1:]]  # The graph is undirected
+
+    latitudes = [graph.nodes[node]['latitude'] for node in nodes]
+    longitudes = [graph.nodes[node]['longitude'] for node in nodes]
+    edges = neighbour_edges(latitudes, longitudes, k=k, radius=radius if graph_mode == 'radius' else None)
+    return [(nodes[i], nodes[j]) for i, j, _ in edges]
@@ -0,0 +1,161 @@
+import heapq
+import math
+from itertools import count
+
+import numpy as np
+
+from geo_index import chord_to_meters
+from haversine import EARTH_RADIUS_M, to_unit_vectors
+from routing import astar_targets, weight_function
+
+
+def _located(graph, nodes):
+    nodes = [node for node in nodes if 'latitude' in graph.nodes[node] and 'longitude' in graph.nodes[node]]
+    points = to_unit_vectors([float(graph.nodes[node]['latitude']) for node in nodes],
+                             [float(graph.nodes[node]['longitude']) for node in nodes])
+    return nodes, points
+
+
+def node_points(graph):
+    """
+    Unit-sphere point (x, y, z) of every node with coordinates, computed in one vectorized pass.
+    Cache it alongside speed_bound and rebuild it when locations are added.
+    """
+    nodes, points = _located(graph, graph.nodes)
+    return dict(zip(nodes, map(tuple, points.tolist())))
+
+
+def speed_bound(graph, weight='base_travel_time'):
+    """
+    Highest straight-line speed (meters per unit of weight) over any edge of the graph.
+
+    No path can cover ground faster than its fastest edge, so great-circle distance divided by
+    this speed never overestimates a travel time. Measured on base travel times, it stays
+    admissible for any weights that only add traffic and weather delay on top of them.
+    """
+    get_weight = weight_function(weight)
+    nodes, points = _located(graph, graph.nodes)
+    row = {node: i for i, node in enumerate(nodes)}
+    pairs = [(row[u], row[v], get_weight(u, v, data)) for u, v, data in graph.edges(data=True) if u in row and v in row]
+    if not pairs:
+        return float('inf')
+    u_rows, v_rows, weights = (np.array(column) for column in zip(*pairs))
+    meters = chord_to_meters(np.linalg.norm(points[u_rows] - points[v_rows], axis=1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speeds = np.where(meters > 0, meters / weights, 0)
+    # Nudged up so rounding in the distance computation can never make the bound inadmissible
+    return float(speeds.max()) * (1 + 1e-9)
+
+
+class GeoHeuristic:
+    """
+    Consistent A* heuristic: great-circle distance to the nearest of the targets divided by a speed bound.
+    Nodes without coordinates get 0.
+
+    Node positions come from node_points(), computed once for the whole graph, so each bound is
+    plain scalar math over the targets' points; pass the cached points to avoid recomputing them.
+    """
+
+    def __init__(self, graph, targets, speed, points=None):
+        self.points = node_points(graph) if points is None else points
+        self.targets = [self.points[target] for target in targets if target in self.points]
+        self._scale = 2 * EARTH_RADIUS_M / speed if speed else 0.0
+        self._cache = {}
+
+    def __call__(self, node):
+        value = self._cache.get(node)
+        if value is None:
+            point = self.points.get(node)
+            if point is None or not self.targets or not self._scale:
+                value = 0.0
+            else:
+                x, y, z = point
+                squared = min((x - tx) ** 2 + (y - ty) ** 2 + (z - tz) ** 2 for tx, ty, tz in self.targets)
+                value = self._scale * math.asin(min(math.sqrt(squared) / 2, 1.0))
+            self._cache[node] = value
+        return value
+
+
+def astar_nearest(graph, source, targets, k=None, weight='weight', speed=None, points=None):
+    """
+    A* version of routing.nearest_targets guided by straight-line distance to the targets.
+    """
+    targets = list(targets)
+    if speed is None:
+        speed = speed_bound(graph)
+    heuristic = GeoHeuristic(graph, targets, speed, points)
+    return astar_targets(graph, source, targets, heuristic, k=k, weight=weight)
+
+
+def bidirectional_astar(graph, source, targets, weight='weight', speed=None, points=None):
+    """
+    Bidirectional A* from source to the nearest of several targets.
+
+    The backward search starts from every target at once. Both directions use the average
+    potential p(v) = (h_targets(v) - h_source(v)) / 2, which keeps the reduced edge costs
+    non-negative in both directions, so the search can stop as soon as the two smallest heap
+    keys add up to the best meeting distance found. Returns (distances, paths) like
+    routing.nearest_targets, holding only the nearest target.
+    """
+    if source not in graph:
+        raise ValueError(f"Source {source} is not in the graph.")
+    targets = set(targets)
+    if not targets:
+        return {}, {}
+    if speed is None:
+        speed = speed_bound(graph)
+    get_weight = weight_function(weight)
+    if points is None:
+        points = node_points(graph)
+    to_targets = GeoHeuristic(graph, targets, speed, points)
+    to_source = GeoHeuristic(graph, [source], speed, points)
+
+    def potential(node):
+        return (to_targets(node) - to_source(node)) / 2
+
+    tie = count()
+    forward = ({source: 0}, {source: None}, set(), [(potential(source), next(tie), source)])
+    backward = ({}, {}, set(), [])
+    for target in targets:
+        backward[0][target] = 0
+        backward[1][target] = None
+        backward[3].append((-potential(target), next(tie), target))
+    heapq.heapify(backward[3])
+
+    best, meeting = float('inf'), None
+    while forward[3] and backward[3]:
+        if forward[3][0][0] + backward[3][0][0] >= best:
+            break
+        # Expand the side with the smaller frontier
+        searching_forward = len(forward[3]) <= len(backward[3])
+        distances, predecessors, settled, heap = forward if searching_forward else backward
+        other_distances = (backward if searching_forward else forward)[0]
+        sign = 1 if searching_forward else -1
+
+        _, _, node = heapq.heappop(heap)
+        if node in settled:
+            continue
+        settled.add(node)
+
+        for neighbor, data in graph[node].items():
+            if neighbor in settled:
+                continue
+            new_dist = distances[node] + (get_weight(node, neighbor, data) if searching_forward
+                                          else get_weight(neighbor, node, data))
+            if new_dist < distances.get(neighbor, float('inf')):
+                distances[neighbor] = new_dist
+                predecessors[neighbor] = node
+                heapq.heappush(heap, (new_dist + sign * potential(neighbor), next(tie), neighbor))
+                if neighbor in other_distances and new_dist + other_distances[neighbor] < best:
+                    best, meeting = new_dist + other_distances[neighbor], neighbor
+        if node in other_distances and distances[node] + other_distances[node] < best:
+            best, meeting = distances[node] + other_distances[node], node
+
+    if meeting is None:
+        return {}, {}
+    path = [meeting]
+    while forward[1][path[0]] is not None:
+        path.insert(0, forward[1][path[0]])
+    while backward[1][path[-1]] is not None:
+        path.append(backward[1][path[-1]])
+    return {path[-1]: best}, {path[-1]: path}
@@ -0,0 +1,86 @@
+import numpy as np
+
+EARTH_RADIUS_M = 6371e3  # Earth radius in meters
+
+
+def to_unit_vectors(latitudes, longitudes):
+    """
+    Convert latitude/longitude arrays (degrees) to 3D points on the unit sphere.
+    """
+    phi = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lam = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_phi = np.cos(phi)
+    return np.column_stack((cos_phi * np.cos(lam), cos_phi * np.sin(lam), np.sin(phi)))
+
+
+def haversine_matrix(latitudes, longitudes, other_latitudes=None, other_longitudes=None, dtype=np.float32):
+    """
+    Haversine distances in meters between every pair of points.
+
+    Returns an (N, M) matrix between the first and second coordinate arrays, or the
+    square (N, N) matrix of the first set against itself when no second set is given.
+    The haversine term equals (1 - cos(angle)) / 2, i.e. (1 - p.q) / 2 for unit vectors,
+    so the whole matrix comes from one matrix product instead of per-pair trigonometry.
+    """
+    points = to_unit_vectors(latitudes, longitudes)
+    if other_latitudes is None:
+        others = points
+    else:
+        others = to_unit_vectors(other_latitudes, other_longitudes)
+
+    a = points @ others.T
+    np.subtract(1, a, out=a)
+    a *= 0.5
+    np.clip(a, 0, 1, out=a)
+    np.sqrt(a, out=a)
+    np.arcsin(a, out=a)
+    a *= 2 * EARTH_RADIUS_M
+    if other_latitudes is None:
+        np.fill_diagonal(a, 0)  # Rounding in p.p would otherwise leave a few centimeters
+    return a.astype(dtype, copy=False)
+
+
+def haversine_blocks(latitudes, longitudes, block_size=1024, dtype=np.float32):
+    """
+    Yield (row_start, block) pairs covering the square distance matrix block_size rows at a time,
+    so the full N x N matrix never has to be held in memory.
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    for start in range(0, len(latitudes), block_size):
+        stop = start + block_size
+        block = haversine_matrix(latitudes[start:stop], longitudes[start:stop], latitudes, longitudes, dtype)
+        rows = np.arange(len(block))
+        block[rows, start + rows] = 0
+        yield start, block
+
+
+def haversine_condensed(latitudes, longitudes, block_size=1024, dtype=np.float32):
+    """
+    Upper triangle of the distance matrix as a flat array, in the same order as scipy's pdist.
+    """
+    n = len(latitudes)
+    condensed = np.empty(n * (n - 1) // 2, dtype=dtype)
+    offset = 0
+    for start, block in haversine_blocks(latitudes, longitudes, block_size, dtype):
+        for row_offset, row in enumerate(block):
+            row_index = start + row_offset
+            tail = row[row_index + 1:]
+            condensed[offset:offset + len(tail)] = tail
+            offset += len(tail)
+    return condensed
+
+
+def distance_dict(ids, latitudes, longitudes, block_size=1024):
+    """
+    Build the dict-of-dicts graph {id: {other_id: meters}} over every pair of distinct ids.
+    """
+    ids = list(ids)
+    graph = {}
+    for start, block in haversine_blocks(latitudes, longitudes, block_size, dtype=np.float64):
+        for row_offset, row in enumerate(block.tolist()):
+            node_id = ids[start + row_offset]
+            edges = dict(zip(ids, row))
+            del edges[node_id]
+            graph[node_id] = edges
+    return graph
@@ -0,0 +1,229 @@
+import itertools
+import threading
+import time
+
+import numpy as np
+
+BLOOD_TYPES = ['A+', 'A-', 'B+', 'B-', 'O+', 'O-', 'AB+', 'AB-']
+BLOOD_TYPE_INDEX = {blood_type: i for i, blood_type in enumerate(BLOOD_TYPES)}
+
+
+def _cells(inventory):
+    # One row of 8 strings for the vectorized parse, and whether the inventory had the right shape
+    if inventory is None:
+        return ['0'] * len(BLOOD_TYPES), True
+    if isinstance(inventory, dict):
+        values = [inventory.get(blood_type, 0) for blood_type in BLOOD_TYPES]
+        shaped = set(inventory) <= BLOOD_TYPE_INDEX.keys()
+    elif isinstance(inventory, (list, tuple, np.ndarray)) and len(inventory) == len(BLOOD_TYPES):
+        values, shaped = list(inventory), True
+    else:
+        return ['0'] * len(BLOOD_TYPES), False
+    # Firestore hands back whole numbers written by some clients as floats
+    return [str(int(value)) if isinstance(value, float) and value.is_integer() else str(value).strip()
+            for value in values], shaped
+
+
+def parse_inventories(inventories):
+    """
+    Parse many stored inventories at once into an (n x 8) int64 count array ordered by BLOOD_TYPES,
+    plus a boolean array marking the rows that were valid.
+
+    An inventory is either the canonical 8-slot list of counts or a {blood_type: units} map whose
+    units may be numeric strings; None means empty. Unknown blood types, a wrong number of slots,
+    and units that are not whole non-negative numbers make the row invalid; the offending units
+    count as 0 and the rest of the row is kept.
+    """
+    rows = [_cells(inventory) for inventory in inventories]
+    cells = np.array([row for row, _ in rows], dtype=str).reshape(-1, len(BLOOD_TYPES))
+    numeric = np.char.isdecimal(cells)
+    counts = np.where(numeric, cells, '0').astype(np.int64)
+    return counts, np.array([shaped for _, shaped in rows], dtype=bool) & numeric.all(axis=1)
+
+
+def inventory_array(inventory):
+    """
+    Canonical 8-slot count array of a single inventory; invalid units count as 0.
+    """
+    return parse_inventories([inventory])[0][0]
+
+
+def encode_inventory(counts):
+    """
+    Counts as the canonical list of 8 ints that is stored in Firestore.
+    """
+    return [int(units) for units in np.asarray(counts).reshape(len(BLOOD_TYPES))]
+
+
+def is_canonical(inventory):
+    return (isinstance(inventory, list) and len(inventory) == len(BLOOD_TYPES)
+            and all(type(units) is int and units >= 0 for units in inventory))
+
+
+class Reservation:
+    """
+    Units of one blood type held at one bank until committed, released or expired.
+    """
+
+    def __init__(self, reservation_id, bank, blood_type, units, expires_at):
+        self.id = reservation_id
+        self.bank = bank
+        self.blood_type = blood_type
+        self.units = units
+        self.expires_at = expires_at
+
+
+class InventoryStore:
+    """
+    Blood inventory for every bank, kept outside the graph.
+
+    Counts live in one (banks x 8) integer array ordered by BLOOD_TYPES. Each bank is
+    guarded by one of `stripes` locks, so requests against different banks never wait
+    on each other. reserve() takes units out of the available count atomically; the
+    hold is then either committed, released back, or returned automatically once its
+    ttl has passed.
+    """
+
+    def __init__(self, stripes=64, reservation_ttl=120):
+        self.reservation_ttl = reservation_ttl
+        self.counts = np.zeros((0, len(BLOOD_TYPES)), dtype=np.int64)
+        self.banks = []
+        self.bank_index = {}
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._reservations = [{} for _ in range(stripes)]
+        self._resize_lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def __contains__(self, bank):
+        return bank in self.bank_index
+
+    def _stripe(self, row):
+        return row % len(self._locks)
+
+    def _row(self, bank):
+        try:
+            return self.bank_index[bank]
+        except KeyError:
+            raise ValueError(f"Blood bank {bank} is not in the inventory.")
+
+    def _column(self, blood_type):
+        try:
+            return BLOOD_TYPE_INDEX[blood_type]
+        except KeyError:
+            raise ValueError(f"Unknown blood type {blood_type}.")
+
+    def add_bank(self, bank, inventory=None):
+        """
+        Register a bank with its initial inventory (8-slot counts or {blood_type: units}); re-adding a bank
+        replaces its counts.
+        """
+        row_counts = inventory_array(inventory)
+
+        with self._resize_lock:
+            if bank in self.bank_index:
+                row = self.bank_index[bank]
+                with self._locks[self._stripe(row)]:
+                    self.counts[row] = row_counts
+                return
+            # Growing the array replaces it, so hold every stripe while copying
+            for lock in self._locks:
+                lock.acquire()
+            try:
+                self.bank_index[bank] = len(self.banks)
+                self.banks.append(bank)
+                self.counts = np.vstack((self.counts, row_counts))
+            finally:
+                for lock in self._locks:
+                    lock.release()
+
+    def available(self, bank, blood_type):
+        """
+        Units of a blood type currently available (not reserved) at a bank; 0 for unknown banks or types.
+        """
+        row = self.bank_index.get(bank)
+        column = BLOOD_TYPE_INDEX.get(blood_type)
+        if row is None or column is None:
+            return 0
+        self._expire_stripe(self._stripe(row))
+        return int(self.counts[row, column])
+
+    def banks_with(self, blood_type, units):
+        """
+        Every bank with at least `units` of a blood type available, in one vectorized comparison.
+        """
+        column = BLOOD_TYPE_INDEX.get(blood_type)
+        if column is None:
+            return []
+        self.expire()
+        return [self.banks[row] for row in np.flatnonzero(self.counts[:, column] >= units)]
+
+    def as_dict(self, bank):
+        """
+        Available units at a bank as a {blood_type: units} dict.
+        """
+        row = self._row(bank)
+        self._expire_stripe(self._stripe(row))
+        return dict(zip(BLOOD_TYPES, self.counts[row].tolist()))
+
+    def reserve(self, bank, blood_type, units, ttl=None):
+        """
+        Atomically hold units of a blood type at a bank. Returns a Reservation, or None if not enough is available.
+        """
+        row, column = self._row(bank), self._column(blood_type)
+        stripe = self._stripe(row)
+        expires_at = time.monotonic() + (self.reservation_ttl if ttl is None else ttl)
+        with self._locks[stripe]:
+            self._expire_locked(stripe)
+            if self.counts[row, column] < units:
+                return None
+            self.counts[row, column] -= units
+            reservation = Reservation(next(self._ids), bank, blood_type, units, expires_at)
+            self._reservations[stripe][reservation.id] = reservation
+        return reservation
+
+    def commit(self, reservation):
+        """
+        Make a reservation permanent. Returns False if it already expired or was released.
+        """
+        stripe = self._stripe(self._row(reservation.bank))
+        with self._locks[stripe]:
+            self._expire_locked(stripe)
+            return self._reservations[stripe].pop(reservation.id, None) is not None
+
+    def release(self, reservation):
+        """
+        Return the units of a reservation to the bank. Returns False if it was already committed, released or expired.
+        """
+        stripe = self._stripe(self._row(reservation.bank))
+        with self._locks[stripe]:
+            if self._reservations[stripe].pop(reservation.id, None) is None:
+                return False
+            self.counts[self.bank_index[reservation.bank], BLOOD_TYPE_INDEX[reservation.blood_type]] += reservation.units
+            return True
+
+    def restock(self, bank, blood_type, units):
+        """
+        Add units of a blood type to a bank.
+        """
+        row, column = self._row(bank), self._column(blood_type)
+        with self._locks[self._stripe(row)]:
+            self.counts[row, column] += units
+
+    def expire(self):
+        """
+        Return the units of every expired reservation to their banks.
+        """
+        for stripe in range(len(self._locks)):
+            self._expire_stripe(stripe)
+
+    def _expire_stripe(self, stripe):
+        if self._reservations[stripe]:
+            with self._locks[stripe]:
+                self._expire_locked(stripe)
+
+    def _expire_locked(self, stripe):
+        now = time.monotonic()
+        reservations = self._reservations[stripe]
+        for reservation_id in [r.id for r in reservations.values() if r.expires_at <= now]:
+            reservation = reservations.pop(reservation_id)
+            self.counts[self.bank_index[reservation.bank], BLOOD_TYPE_INDEX[reservation.blood_type]] += reservation.units
@@ -0,0 +1,146 @@
+import argparse
+import json
+import logging
+import threading
+import time
+
+from data_sources import DEFAULT_CREDENTIALS, open_source
+from network_view import LabNetworkView
+
+
+class MatchingService:
+    """
+    Long-running matcher from requirement documents to their nearest suitable lab.
+
+    Hospitals, labs and inventories are loaded once into a LabNetworkView and kept current by its
+    snapshot listeners, so each requirement costs one in-memory lookup. Requirements arrive either
+    through a listener on the requirements collection (start()), through a paged scan of the
+    whole collection (backfill()), or by id through batched get_all reads (match_ids()). Every
+    match is passed to on_match as a dict and remembered in matches.
+    """
+
+    def __init__(self, db, view=None, nearest_neighbours=8, on_match=None, page_size=500):
+        self.db = db
+        self.view = view or LabNetworkView(db, nearest_neighbours=nearest_neighbours)
+        self.on_match = on_match or (lambda match: logging.info(f"Match: {match}"))
+        self.page_size = page_size
+        self.matches = {}
+        self._watch = None
+        self._lock = threading.Lock()
+
+    def start(self, include_existing=True):
+        """
+        Start the lab view and listen for requirements. The listener's first snapshot holds every
+        existing requirement; with include_existing=False those are skipped and only new or
+        modified requirements are matched.
+        """
+        self.view.start().wait_ready()
+        initial = [not include_existing]
+
+        def on_snapshot(documents, changes, read_time):
+            skip, initial[0] = initial[0], False
+            for change in changes:
+                if change.type.name == 'REMOVED':
+                    with self._lock:
+                        self.matches.pop(change.document.id, None)
+                elif not skip:
+                    self._emit(change.document.id, change.document.to_dict())
+
+        self._watch = self.db.collection('requirements').on_snapshot(on_snapshot)
+        return self
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+        self.view.stop()
+
+    def match(self, requirement_id, requirement):
+        """
+        Nearest lab for one requirement document, as a match dict (lab None when nothing matches).
+        """
+        hospital = requirement.get('hospital')
+        hospital_id = getattr(hospital, 'id', hospital)
+        demand = requirement.get('demand') or {}
+        lab, distance = self.view.find_nearest_lab(hospital_id, demand)
+        return {
+            'requirement': requirement_id,
+            'hospital': hospital_id,
+            'demand': demand,
+            'lab': lab['id'] if lab else None,
+            'lab_name': lab.get('name') if lab else None,
+            'distance_km': round(distance / 1000, 3) if lab else None,
+        }
+
+    def match_ids(self, requirement_ids):
+        """
+        Match the given requirements, reading them with one get_all call per page_size ids.
+        """
+        self.view.start().wait_ready()
+        collection = self.db.collection('requirements')
+        requirement_ids = list(requirement_ids)
+        for start in range(0, len(requirement_ids), self.page_size):
+            references = [collection.document(doc_id) for doc_id in requirement_ids[start:start + self.page_size]]
+            for snapshot in self.db.get_all(references):
+                if snapshot.exists:
+                    self._emit(snapshot.id, snapshot.to_dict())
+                else:
+                    logging.warning(f"Requirement {snapshot.id} does not exist")
+
+    def backfill(self):
+        """
+        Match every stored requirement, scanning the collection page_size documents at a time.
+        """
+        self.view.start().wait_ready()
+        last = None
+        while True:
+            query = self.db.collection('requirements').order_by('__name__').limit(self.page_size)
+            if last is not None:
+                query = query.start_after(last)
+            page = list(query.stream())
+            for snapshot in page:
+                self._emit(snapshot.id, snapshot.to_dict())
+            if len(page) < self.page_size:
+                return
+            last = page[-1]
+
+    def _emit(self, requirement_id, requirement):
+        try:
+            match = self.match(requirement_id, requirement or {})
+        except Exception as e:
+            logging.error(f"Error matching requirement {requirement_id}: {e}")
+            return
+        with self._lock:
+            self.matches[requirement_id] = match
+        self.on_match(match)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Match blood requirements to their nearest suitable lab.")
+    parser.add_argument('--requirement-id', action='append', default=[],
+                        help="match these requirements and exit (repeatable)")
+    parser.add_argument('--backfill', action='store_true', help="match every stored requirement and exit")
+    parser.add_argument('--new-only', action='store_true', help="when listening, skip requirements that already exist")
+    parser.add_argument('--nearest-neighbours', type=int, default=8)
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--source', metavar='PATH', help="read a bulk_seed.py --dry-run JSONL file instead of Firestore")
+    parser.add_argument('--credentials', default=DEFAULT_CREDENTIALS)
+    args = parser.parse_args()
+
+    service = MatchingService(open_source(args.source, args.credentials), nearest_neighbours=args.nearest_neighbours,
+                              on_match=lambda match: print(json.dumps(match, default=str), flush=True),
+                              page_size=args.page_size)
+
+    if args.requirement_id or args.backfill:
+        service.match_ids(args.requirement_id)
+        if args.backfill:
+            service.backfill()
+        service.stop()
+    else:
+        service.start(include_existing=not args.new_only)
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            service.stop()
@@ -0,0 +1,62 @@
+import argparse
+import logging
+from itertools import islice
+
+from bulk_seed import FirestoreSink
+from data_sources import DEFAULT_CREDENTIALS, open_source
+from inventory import encode_inventory, is_canonical, parse_inventories
+
+COLLECTIONS = ('labs', 'hospitals')
+
+
+def migrate(db, collections=COLLECTIONS, page_size=1000, dry_run=False, sink=None):
+    """
+    Rewrite every blood_inventory that is not yet in the canonical 8-slot integer encoding.
+
+    Documents are streamed page_size at a time and each page is parsed in one vectorized pass.
+    Only the blood_inventory field of documents that need it is written (merged, in batches);
+    documents without an inventory are left alone. Invalid counts are written as 0 and the
+    document ids are logged. Returns {collection: {'scanned', 'migrated', 'invalid'}}.
+    """
+    if sink is None and not dry_run:
+        sink = FirestoreSink(db, merge=True)
+    report = {}
+    for collection in collections:
+        counts = {'scanned': 0, 'migrated': 0, 'invalid': 0}
+        stream = db.collection(collection).stream()
+        while True:
+            page = [(document.id, (document.to_dict() or {}).get('blood_inventory'))
+                    for document in islice(stream, page_size)]
+            if not page:
+                break
+            counts['scanned'] += len(page)
+            stale = [(doc_id, inventory) for doc_id, inventory in page
+                     if inventory is not None and not is_canonical(inventory)]
+            parsed, valid = parse_inventories([inventory for _, inventory in stale])
+            for (doc_id, inventory), ok in zip(stale, valid.tolist()):
+                if not ok:
+                    counts['invalid'] += 1
+                    logging.warning(f"{collection}/{doc_id} has an invalid blood_inventory {inventory!r}; "
+                                    f"bad counts become 0")
+            updates = [(doc_id, {'blood_inventory': encode_inventory(row)}) for (doc_id, _), row in zip(stale, parsed)]
+            if updates and not dry_run:
+                counts['migrated'] += sink.write(collection, updates)
+            elif dry_run:
+                counts['migrated'] += len(updates)
+        report[collection] = counts
+        logging.info(f"{collection}: {counts}")
+    return report
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Convert stored blood inventories to the 8-slot integer encoding.")
+    parser.add_argument('--collection', action='append', choices=COLLECTIONS,
+                        help="collection to migrate (repeatable, default: all)")
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--dry-run', action='store_true', help="report what would change without writing")
+    parser.add_argument('--source', metavar='PATH', help="check a bulk_seed.py --dry-run JSONL file (with --dry-run)")
+    parser.add_argument('--credentials', default=DEFAULT_CREDENTIALS)
+    args = parser.parse_args()
+
+    print(migrate(open_source(args.source, args.credentials), args.collection or COLLECTIONS, args.page_size, args.dry_run))
@@ -0,0 +1,186 @@
+import logging
+import threading
+
+import networkx as nx
+
+from compatibility import donor_mask, stock_masks, stock_tags
+from inventory import parse_inventories
+from geo_index import DynamicGeoIndex, neighbour_edges
+
+COLLECTIONS = ('hospitals', 'labs')
+
+
+class LabNetworkView:
+    """
+    Long-lived in-memory view of the hospitals and labs collections and the labs' inventories.
+
+    start() subscribes to both collections with Firestore on_snapshot listeners. The first
+    snapshot delivers every document once; after that only changed documents arrive, and each
+    change touches just its own node: its k-nearest edges in the graph, its entry in the node
+    index and, for labs, its stock tags in the lab index. Queries are answered from memory.
+
+    Changes are applied through apply_change(), so the view can be driven by the Firestore
+    emulator (set FIRESTORE_EMULATOR_HOST before creating the client), by any object exposing
+    collection(name).on_snapshot(callback), or by calling apply_change() directly.
+    """
+
+    def __init__(self, db=None, nearest_neighbours=8):
+        self.db = db
+        self.nearest_neighbours = nearest_neighbours
+        self.hospitals = {}
+        self.labs = {}
+        self.graph = nx.Graph()
+        self.node_index = DynamicGeoIndex()
+        self.lab_index = DynamicGeoIndex()
+        self.changes_applied = 0
+        self._lock = threading.RLock()
+        self._ready = {collection: threading.Event() for collection in COLLECTIONS}
+        self._watches = []
+
+    def start(self):
+        if self._watches:
+            return self
+        for collection in COLLECTIONS:
+            self._watches.append(self.db.collection(collection).on_snapshot(self._listener(collection)))
+        return self
+
+    def stop(self):
+        for watch in self._watches:
+            watch.unsubscribe()
+        self._watches = []
+
+    def wait_ready(self, timeout=None):
+        """
+        Block until the initial snapshot of every collection has been applied.
+        """
+        return all(self._ready[collection].wait(timeout) for collection in COLLECTIONS)
+
+    def apply_changes(self, collection, changes):
+        """
+        Apply a batch of (change_type, doc_id, data) changes from one collection. Lab inventories in
+        the batch are parsed and turned into stock tags in one vectorized pass over all of them.
+        """
+        tags = [None] * len(changes)
+        if collection == 'labs':
+            rows = [i for i, (change_type, _, data) in enumerate(changes) if change_type != 'REMOVED' and data]
+            counts, valid = parse_inventories([changes[i][2].get('blood_inventory') for i in rows])
+            for i, mask, ok in zip(rows, stock_masks(counts).tolist(), valid.tolist()):
+                tags[i] = mask
+                if not ok:
+                    logging.warning(f"labs/{changes[i][1]} has an invalid blood_inventory; bad counts read as 0")
+        for (change_type, doc_id, data), stock in zip(changes, tags):
+            try:
+                self.apply_change(collection, change_type, doc_id, data, stock)
+            except Exception as e:
+                logging.error(f"Error applying change to {collection}/{doc_id}: {e}")
+
+    def apply_change(self, collection, change_type, doc_id, data=None, stock=None):
+        """
+        Apply one document change ('ADDED', 'MODIFIED' or 'REMOVED') from the given collection.
+        stock is the lab's stock tag mask when the caller has already parsed its inventory.
+        """
+        documents = self.hospitals if collection == 'hospitals' else self.labs
+        with self._lock:
+            self.changes_applied += 1
+            if change_type == 'REMOVED':
+                if documents.pop(doc_id, None) is not None:
+                    self._remove_node(doc_id)
+                    self.lab_index.remove(doc_id)
+                return
+
+            location = (data or {}).get('location')
+            if location is None:
+                logging.warning(f"Skipping {collection}/{doc_id} without a location")
+                return
+            document = {**data, 'id': doc_id}
+            previous = documents.get(doc_id)
+            documents[doc_id] = document
+
+            coordinates = (location.latitude, location.longitude)
+            if previous is None or _coordinates(previous) != coordinates:
+                if previous is not None:
+                    self._remove_node(doc_id)
+                self._add_node(doc_id, collection, *coordinates)
+            if collection == 'labs':
+                if stock is None:
+                    stock = stock_tags(document.get('blood_inventory'))
+                self.lab_index.upsert(doc_id, *coordinates, stock)
+
+    def find_nearest_lab(self, hospital_id, required_blood_types):
+        """
+        Nearest lab stocking a type compatible with one of the required types, as (lab, meters),
+        or (None, inf) when the hospital is unknown or no lab matches.
+        """
+        with self._lock:
+            hospital = self.hospitals.get(hospital_id)
+            required_tags = donor_mask(required_blood_types)
+            if hospital is None or not required_tags:
+                return None, float('inf')
+            location = hospital['location']
+            matches = self.lab_index.nearest(location.latitude, location.longitude, require_tags=required_tags)
+            if not matches:
+                return None, float('inf')
+            lab_id, distance = matches[0]
+            return self.labs[lab_id], distance
+
+    def rebuild_graph(self):
+        """
+        Recompute the neighbour graph from scratch. Incremental updates keep every node linked to
+        its nearest neighbours, but removals can leave the graph looser than a fresh build.
+        """
+        with self._lock:
+            ids = list(self.graph.nodes)
+            latitudes = [self.graph.nodes[node]['latitude'] for node in ids]
+            longitudes = [self.graph.nodes[node]['longitude'] for node in ids]
+            self.graph.remove_edges_from(list(self.graph.edges))
+            if self.nearest_neighbours and ids:
+                for i, j, distance in neighbour_edges(latitudes, longitudes, k=self.nearest_neighbours):
+                    self.graph.add_edge(ids[i], ids[j], weight=distance)
+            else:
+                for node in ids:
+                    self._link(node)
+            self.node_index.rebuild()
+            self.lab_index.rebuild()
+
+    def _listener(self, collection):
+        def on_snapshot(documents, changes, read_time):
+            self.apply_changes(collection, [
+                (change.type.name, change.document.id,
+                 None if change.type.name == 'REMOVED' else change.document.to_dict())
+                for change in changes
+            ])
+            self._ready[collection].set()
+        return on_snapshot
+
+    def _add_node(self, node_id, collection, latitude, longitude):
+        self.graph.add_node(node_id, latitude=latitude, longitude=longitude, kind=collection)
+        self._link(node_id)
+        self.node_index.upsert(node_id, latitude, longitude)
+
+    def _link(self, node_id, wanted=None):
+        data = self.graph.nodes[node_id]
+        if wanted is None:
+            wanted = self.nearest_neighbours or len(self.node_index)
+        neighbours = self.node_index.nearest(data['latitude'], data['longitude'], k=wanted + self.graph.degree(node_id),
+                                             exclude=[node_id])
+        for other_id, distance in neighbours:
+            if self.graph.degree(node_id) >= wanted and self.nearest_neighbours:
+                break
+            if not self.graph.has_edge(node_id, other_id):
+                self.graph.add_edge(node_id, other_id, weight=distance)
+
+    def _remove_node(self, node_id):
+        neighbours = list(self.graph[node_id]) if node_id in self.graph else []
+        if node_id in self.graph:
+            self.graph.remove_node(node_id)
+        self.node_index.remove(node_id)
+        # Neighbours that lost an edge pick up their next nearest node
+        if self.nearest_neighbours:
+            for other_id in neighbours:
+                if self.graph.degree(other_id) < self.nearest_neighbours:
+                    self._link(other_id)
+
+
+def _coordinates(document):
+    location = document['location']
+    return location.latitude, location.longitude
@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+ORS_MATRIX_URL = "https://api.openrouteservice.org/v2/matrix/driving-car"
+
+
+class ORSMatrixClient:
+    """
+    Client for the OpenRouteService matrix endpoint with request pacing and retries.
+
+    Calls are spaced to stay under requests_per_minute across all threads. Rate-limit
+    (429) and server errors are retried with exponential backoff, honouring Retry-After
+    when the provider sends it.
+    """
+
+    def __init__(self, api_key, tile_size=50, requests_per_minute=40, max_retries=5, backoff=1.0,
+                 session=None, url=ORS_MATRIX_URL):
+        self.api_key = api_key
+        self.tile_size = tile_size
+        self.min_interval = 60.0 / requests_per_minute if requests_per_minute else 0
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.url = url
+        self._pace_lock = threading.Lock()
+        self._next_request_at = 0.0
+
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', HTTPAdapter(pool_maxsize=4))
+        self.session = session
+
+    def _wait_for_slot(self):
+        with self._pace_lock:
+            now = time.monotonic()
+            wait = self._next_request_at - now
+            self._next_request_at = max(now, self._next_request_at) + self.min_interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def fetch(self, locations, sources, destinations):
+        """
+        Request distances (meters) and durations (seconds) from sources to destinations.
+        locations is a list of [lon, lat] pairs; sources and destinations index into it.
+        """
+        payload = {
+            "locations": locations,
+            "sources": sources,
+            "destinations": destinations,
+            "metrics": ["distance", "duration"],
+            "units": "m",
+        }
+        headers = {"Authorization": self.api_key, "Content-Type": "application/json"}
+
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_slot()
+            try:
+                response = self.session.post(self.url, json=payload, headers=headers)
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise requests.HTTPError(f"{response.status_code} from matrix endpoint", response=response)
+                response.raise_for_status()
+                data = response.json()
+                return data['distances'], data.get('durations')
+            except requests.RequestException as e:
+                status = e.response.status_code if e.response is not None else None
+                if attempt == self.max_retries or (status is not None and status < 500 and status != 429):
+                    raise
+                retry_after = e.response.headers.get('Retry-After') if e.response is not None else None
+                delay = float(retry_after) if retry_after else self.backoff * 2 ** attempt
+                logging.warning(f"Matrix request failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def tiles(self, pairs):
+        """
+        Group the wanted (i, j) index pairs, i < j, into tile_size x tile_size blocks.
+        """
+        blocks = {}
+        for i, j in pairs:
+            i, j = min(i, j), max(i, j)
+            blocks.setdefault((i // self.tile_size, j // self.tile_size), []).append((i, j))
+        return blocks
+
+    def pair_distances(self, latitudes, longitudes, pairs):
+        """
+        Return (i, j, distance, duration) for each wanted index pair, one matrix call per tile.
+        """
+        results = []
+        for (block_i, block_j), wanted in self.tiles(pairs).items():
+            sources = sorted({i for i, _ in wanted})
+            destinations = sorted({j for _, j in wanted})
+            indices = list(dict.fromkeys(sources + destinations))
+            position = {index: k for k, index in enumerate(indices)}
+            locations = [[float(longitudes[index]), float(latitudes[index])] for index in indices]
+
+            try:
+                distances, durations = self.fetch(
+                    locations,
+                    [position[i] for i in sources],
+                    [position[j] for j in destinations],
+                )
+            except (KeyError, requests.RequestException) as e:
+                logging.error(f"Error fetching matrix tile {block_i}x{block_j}: {e}")
+                continue
+            row = {i: r for r, i in enumerate(sources)}
+            column = {j: c for c, j in enumerate(destinations)}
+            for i, j in wanted:
+                distance = distances[row[i]][column[j]]
+                duration = durations[row[i]][column[j]] if durations else None
+                if distance is not None:
+                    results.append((i, j, distance, duration))
+        return results
+
+
+def bulk_edge_distances(client, graph, pairs, cache=None):
+    """
+    Road distances for the given node pairs, read from the route cache where possible and
+    fetched through the matrix endpoint otherwise. Returns a list of (u, v, distance).
+    """
+    pairs = list(pairs)
+    edges = []
+    missing = []
+    if cache is not None:
+        cached = cache.get_many([(graph.nodes[u]['latitude'], graph.nodes[u]['longitude'],
+                                  graph.nodes[v]['latitude'], graph.nodes[v]['longitude']) for u, v in pairs])
+    else:
+        cached = [None] * len(pairs)
+    for (u, v), hit in zip(pairs, cached):
+        if hit is not None:
+            edges.append((u, v, hit[0]))
+        else:
+            missing.append((u, v))
+    if not missing:
+        if cache is not None:
+            cache.flush()
+        return edges
+
+    nodes = list(dict.fromkeys(node for pair in missing for node in pair))
+    index = {node: i for i, node in enumerate(nodes)}
+    latitudes = [graph.nodes[node]['latitude'] for node in nodes]
+    longitudes = [graph.nodes[node]['longitude'] for node in nodes]
+
+    fetched = client.pair_distances(latitudes, longitudes, [(index[u], index[v]) for u, v in missing])
+    if cache is not None:
+        cache.put_many([(latitudes[i], longitudes[i], latitudes[j], longitudes[j], distance, duration)
+                        for i, j, distance, duration in fetched])
+    edges.extend((nodes[i], nodes[j], distance) for i, j, distance, _ in fetched)
+    return edges
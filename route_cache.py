@@ -0,0 +1,182 @@
+import sqlite3
+import threading
+import time
+
+# Pairs per SELECT in get_many; four parameters each keeps us under SQLite's variable limit
+LOOKUP_CHUNK = 200
+
+
+class RouteCache:
+    """
+    Persistent SQLite cache of road distances/durations between coordinate pairs.
+
+    Coordinates are rounded to `precision` decimals and each pair is stored once in a
+    canonical order, so (a, b) and (b, a) share an entry. Entries older than ttl seconds
+    count as misses, and once the cache grows past max_entries the least recently used
+    entries are evicted down to evict_to of max_entries. The entry count is tracked in memory
+    as an upper bound, so writes only count the table when it may actually be full.
+
+    Reads never write: last_used touches are buffered in memory and written in one statement
+    by flush(), which put_many() and close() call, or once flush_every touches have built up.
+    The database is only opened on first use, so constructing a cache costs nothing.
+    """
+
+    def __init__(self, path='ors_cache.sqlite', ttl=7 * 24 * 3600, max_entries=200000, precision=5,
+                 flush_every=10000, evict_to=0.9):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.precision = precision
+        self.flush_every = flush_every
+        self.evict_to = evict_to
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._db = None
+        self._size = 0  # Upper bound on the stored entries: replaced rows are counted as new
+
+    @property
+    def _connection(self):
+        # Callers hold self._lock, so the database is opened exactly once
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS routes (
+                    lat1 REAL, lon1 REAL, lat2 REAL, lon2 REAL,
+                    distance REAL, duration REAL,
+                    fetched_at REAL, last_used REAL,
+                    PRIMARY KEY (lat1, lon1, lat2, lon2)
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS routes_last_used ON routes (last_used)")
+            self._db.commit()
+            self._size = self._db.execute("SELECT COUNT(*) FROM routes").fetchone()[0]
+        return self._db
+
+    def key(self, lat1, lon1, lat2, lon2):
+        """
+        Canonical key for a pair of coordinates, identical for both directions.
+        """
+        a = (round(float(lat1), self.precision), round(float(lon1), self.precision))
+        b = (round(float(lat2), self.precision), round(float(lon2), self.precision))
+        return a + b if a <= b else b + a
+
+    def get(self, lat1, lon1, lat2, lon2):
+        """
+        Return the cached (distance, duration) for the pair, or None on a miss.
+        """
+        key = self.key(lat1, lon1, lat2, lon2)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT distance, duration, fetched_at FROM routes WHERE lat1=? AND lon1=? AND lat2=? AND lon2=?", key
+            ).fetchone()
+            if row is None or now - row[2] > self.ttl:
+                self.misses += 1
+                return None
+            self._touch([key], now)
+            self.hits += 1
+            return row[0], row[1]
+
+    def get_many(self, pairs):
+        """
+        Look up several (lat1, lon1, lat2, lon2) pairs at once. Returns a list in the same order
+        holding (distance, duration) for hits and None for misses.
+        """
+        keys = [self.key(*pair) for pair in pairs]
+        wanted = list(dict.fromkeys(keys))
+        now = time.time()
+        found = {}
+        with self._lock:
+            for start in range(0, len(wanted), LOOKUP_CHUNK):
+                chunk = wanted[start:start + LOOKUP_CHUNK]
+                # CROSS JOIN keeps the pairs as the outer loop, so each one is a primary-key lookup
+                rows = self._connection.execute(
+                    "WITH wanted (lat1, lon1, lat2, lon2) AS (VALUES " + ", ".join(["(?, ?, ?, ?)"] * len(chunk)) + ") "
+                    "SELECT r.lat1, r.lon1, r.lat2, r.lon2, r.distance, r.duration, r.fetched_at "
+                    "FROM wanted w CROSS JOIN routes r "
+                    "ON r.lat1 = w.lat1 AND r.lon1 = w.lon1 AND r.lat2 = w.lat2 AND r.lon2 = w.lon2",
+                    [value for key in chunk for value in key]
+                ).fetchall()
+                for row in rows:
+                    if now - row[6] <= self.ttl:
+                        found[row[:4]] = (row[4], row[5])
+            results = [found.get(key) for key in keys]
+            hits = sum(result is not None for result in results)
+            self.hits += hits
+            self.misses += len(results) - hits
+            self._touch(found, now)
+        return results
+
+    def put(self, lat1, lon1, lat2, lon2, distance, duration=None):
+        """
+        Store the distance (meters) and duration (seconds) for the pair.
+        """
+        self.put_many([(lat1, lon1, lat2, lon2, distance, duration)])
+
+    def put_many(self, entries):
+        """
+        Store several (lat1, lon1, lat2, lon2, distance, duration) entries in one transaction.
+        """
+        now = time.time()
+        rows = [self.key(*entry[:4]) + (entry[4], entry[5], now, now) for entry in entries]
+        with self._lock:
+            self._write_touches()
+            self._connection.executemany("INSERT OR REPLACE INTO routes VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._size += len(rows)
+            if self._size > self.max_entries:
+                self._evict()
+            self._connection.commit()
+
+    def flush(self):
+        """
+        Write the buffered last_used touches.
+        """
+        with self._lock:
+            self._write_touches()
+            self._connection.commit()
+
+    def _touch(self, keys, now):
+        for key in keys:
+            self._touched[key] = now
+        if len(self._touched) >= self.flush_every:
+            self._write_touches()
+            self._connection.commit()
+
+    def _write_touches(self):
+        if self._touched:
+            self._connection.executemany(
+                "UPDATE routes SET last_used=? WHERE lat1=? AND lon1=? AND lat2=? AND lon2=?",
+                [(used,) + key for key, used in self._touched.items()]
+            )
+            self._touched = {}
+
+    def _evict(self):
+        # Evicting below max_entries leaves room for many more writes before the next count
+        count = self._connection.execute("SELECT COUNT(*) FROM routes").fetchone()[0]
+        if count > self.max_entries:
+            keep = int(self.max_entries * self.evict_to)
+            self._connection.execute(
+                "DELETE FROM routes WHERE rowid IN (SELECT rowid FROM routes ORDER BY last_used LIMIT ?)",
+                (count - keep,)
+            )
+            count = keep
+        self._size = count
+
+    def stats(self):
+        """
+        Hit/miss counters and the number of stored entries.
+        """
+        with self._lock:
+            size = self._connection.execute("SELECT COUNT(*) FROM routes").fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'entries': size}
+
+    def close(self):
+        with self._lock:
+            if self._db is None:
+                return
+            self._write_touches()
+            self._db.commit()
+            self._db.close()
+            self._db = None
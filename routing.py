@@ -0,0 +1,232 @@
+import heapq
+from collections.abc import Mapping
+from itertools import count, islice
+
+import networkx as nx
+
+
+def weight_function(weight):
+    """
+    Return a function reading the given attribute from an edge data dict.
+    """
+    if callable(weight):
+        return weight
+    return lambda u, v, data: data.get(weight, 1)
+
+
+def build_path(predecessors, target):
+    """
+    Walk the predecessor map back from the target and return the path source -> target.
+    """
+    path = [target]
+    while predecessors[path[-1]] is not None:
+        path.append(predecessors[path[-1]])
+    path.reverse()
+    return path
+
+
+class LazyPaths(Mapping):
+    """
+    Read-only mapping target -> path that walks the predecessor map only when a path is asked for,
+    so a search that settles many targets pays only for the paths actually used.
+    """
+
+    def __init__(self, predecessors, targets):
+        self.predecessors = predecessors
+        self.targets = list(targets)
+        self._target_set = set(self.targets)
+        self._paths = {}
+
+    def __getitem__(self, target):
+        if target not in self._paths:
+            if target not in self._target_set:
+                raise KeyError(target)
+            self._paths[target] = self._build(target)
+        return self._paths[target]
+
+    def _build(self, target):
+        return build_path(self.predecessors, target)
+
+    def __iter__(self):
+        return iter(self.targets)
+
+    def __len__(self):
+        return len(self.targets)
+
+
+class RouteOption:
+    """
+    One ranked way to reach a target: its cost, a rank used for sorting ahead of the cost, and a
+    path materialised on first access. Unpacks as (path, cost) like the backup tuples it replaces.
+    """
+
+    def __init__(self, target, cost, paths, rank=0):
+        self.target = target
+        self.cost = cost
+        self.rank = rank
+        self._paths = paths
+
+    @property
+    def path(self):
+        return self._paths[self.target]
+
+    def __iter__(self):
+        return iter((self.path, self.cost))
+
+    def __repr__(self):
+        return f"RouteOption({self.target!r}, {self.cost!r}, rank={self.rank})"
+
+
+def nearest_targets(graph, source, targets, k=None, weight='weight'):
+    """
+    Run a single Dijkstra search from source and settle the nearest targets.
+
+    Returns (distances, paths) where distances maps each settled target to its
+    shortest distance in settling order (nearest first) and paths maps it to the
+    node list from source. The search stops as soon as k targets (or all of them
+    when k is None) have been settled, so its cost only depends on the part of
+    the graph closer than the k-th nearest target.
+    """
+    if source not in graph:
+        raise ValueError(f"Source {source} is not in the graph.")
+
+    remaining = set(targets)
+    if k is None:
+        k = len(remaining)
+    get_weight = weight_function(weight)
+
+    distances = {}
+    predecessors = {source: None}
+    settled = set()
+    tie = count()
+    heap = [(0, next(tie), source)]
+    best = {source: 0}
+
+    while heap and len(distances) < k:
+        dist, _, node = heapq.heappop(heap)
+        if node in settled:
+            continue
+        settled.add(node)
+
+        if node in remaining:
+            distances[node] = dist
+
+        for neighbor, data in graph[node].items():
+            if neighbor in settled:
+                continue
+            new_dist = dist + get_weight(node, neighbor, data)
+            if new_dist < best.get(neighbor, float('inf')):
+                best[neighbor] = new_dist
+                predecessors[neighbor] = node
+                heapq.heappush(heap, (new_dist, next(tie), neighbor))
+
+    return distances, LazyPaths(predecessors, distances)
+
+
+def astar_targets(graph, source, targets, heuristic, k=None, weight='weight'):
+    """
+    A* search from source towards a set of targets, settling up to k of them nearest first.
+
+    heuristic(node) must be a consistent lower bound on the distance from node to the
+    nearest target. Targets are popped with exact distances but not necessarily in distance
+    order, so the search only stops once the k best found are no farther than the smallest
+    f-value left on the heap. Returns (distances, paths) like nearest_targets.
+    """
+    if source not in graph:
+        raise ValueError(f"Source {source} is not in the graph.")
+
+    remaining = set(targets)
+    if k is None:
+        k = len(remaining)
+    get_weight = weight_function(weight)
+
+    found = []
+    predecessors = {source: None}
+    settled = set()
+    tie = count()
+    best = {source: 0}
+    heap = [(heuristic(source), next(tie), 0, source)]
+
+    while heap and k:
+        f, _, dist, node = heap[0]
+        if len(found) >= k and found[k - 1][0] <= f:
+            break
+        heapq.heappop(heap)
+        if node in settled:
+            continue
+        settled.add(node)
+
+        if node in remaining:
+            found.append((dist, node))
+            found.sort()
+
+        for neighbor, data in graph[node].items():
+            if neighbor in settled:
+                continue
+            new_dist = dist + get_weight(node, neighbor, data)
+            if new_dist < best.get(neighbor, float('inf')):
+                best[neighbor] = new_dist
+                predecessors[neighbor] = node
+                heapq.heappush(heap, (new_dist + heuristic(neighbor), next(tie), new_dist, neighbor))
+
+    distances = {target: dist for dist, target in found[:k]}
+    return distances, LazyPaths(predecessors, distances)
+
+
+def time_dependent_targets(graph, source, targets, edge_cost, k=None):
+    """
+    Time-dependent Dijkstra from source, settling up to k targets by earliest arrival.
+
+    edge_cost(u, v, data, elapsed) is the cost of edge u -> v when it is entered `elapsed`
+    after leaving the source. As long as entering an edge later never gets you out of it
+    earlier (FIFO), settling nodes by arrival is exact. Returns (distances, paths) like
+    nearest_targets, with distances measured as elapsed cost.
+    """
+    if source not in graph:
+        raise ValueError(f"Source {source} is not in the graph.")
+
+    remaining = set(targets)
+    if k is None:
+        k = len(remaining)
+
+    distances = {}
+    predecessors = {source: None}
+    settled = set()
+    tie = count()
+    heap = [(0, next(tie), source)]
+    best = {source: 0}
+
+    while heap and len(distances) < k:
+        elapsed, _, node = heapq.heappop(heap)
+        if node in settled:
+            continue
+        settled.add(node)
+
+        if node in remaining:
+            distances[node] = elapsed
+
+        for neighbor, data in graph[node].items():
+            if neighbor in settled:
+                continue
+            arrival = elapsed + edge_cost(node, neighbor, data, elapsed)
+            if arrival < best.get(neighbor, float('inf')):
+                best[neighbor] = arrival
+                predecessors[neighbor] = node
+                heapq.heappush(heap, (arrival, next(tie), neighbor))
+
+    return distances, LazyPaths(predecessors, distances)
+
+
+def alternative_paths(graph, source, target, k=3, weight='weight', closed=()):
+    """
+    Up to k loopless source -> target paths in increasing cost (Yen's algorithm), skipping closed edges.
+    Returns a list of (path, cost).
+    """
+    get_weight = weight_function(weight)
+    if closed:
+        graph = nx.restricted_view(graph, [], list(closed) + [(v, u) for u, v in closed])
+    try:
+        paths = list(islice(nx.shortest_simple_paths(graph, source, target, weight=get_weight), k))
+    except nx.NetworkXNoPath:
+        return []
+    return [(path, sum(get_weight(u, v, graph[u][v]) for u, v in zip(path, path[1:]))) for path in paths]
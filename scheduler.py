@@ -0,0 +1,247 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+
+# Highest priority first
+URGENCY_TIERS = ('immediate', 'urgent', 'routine')
+
+
+def parse_deadline(last_date):
+    """
+    Turn a requirement's lastDate (ISO string or datetime) into a sortable timestamp; no date sorts last.
+    """
+    if last_date is None:
+        return float('inf')
+    if isinstance(last_date, str):
+        last_date = datetime.fromisoformat(last_date)
+    return last_date.timestamp()
+
+
+class Allocation:
+    """
+    What a request's future resolves to: its pickups and shortfall, unpacking as (pickups, shortfall).
+
+    Held allocations of lower-tier requests can still be preempted. Their units are then given
+    back, revoked becomes True and the on_revoke callbacks run; the request itself is queued again
+    and its new allocation arrives on request.future.
+    """
+
+    def __init__(self, pickups, shortfall):
+        self.pickups = pickups
+        self.shortfall = shortfall
+        self.revoked = False
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def on_revoke(self, callback):
+        """
+        Call callback(allocation) once this allocation is revoked, at once if it already was.
+        """
+        with self._lock:
+            if not self.revoked:
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def revoke(self):
+        with self._lock:
+            self.revoked = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                logging.error(f"Error in revocation callback: {e}")
+
+    def __iter__(self):
+        return iter((self.pickups, self.shortfall))
+
+    def __repr__(self):
+        return f"Allocation({self.pickups!r}, {self.shortfall!r}, revoked={self.revoked})"
+
+
+class ScheduledRequest:
+    """
+    A request waiting in, or served by, the scheduler. future resolves to an Allocation; if the
+    request is preempted, that Allocation is revoked and the request is queued again with a
+    fresh future.
+    """
+
+    def __init__(self, request_id, hospital, demand, urgency, deadline):
+        self.request_id = request_id
+        self.hospital = hospital
+        self.demand = demand
+        self.urgency = urgency
+        self.tier = URGENCY_TIERS.index(urgency)
+        self.deadline = deadline
+        self.preemptions = 0
+        self.future = Future()
+
+
+class RequestScheduler:
+    """
+    Priority scheduler for blood requests with one queue per urgency tier.
+
+    Workers always take from the highest non-empty tier, and within a tier the request with
+    the earliest lastDate goes first. Immediate requests are committed at once; lower tiers
+    only hold their units until confirm() is called. When an immediate request cannot be
+    filled, holds of lower-tier requests are released (lowest tier, latest deadline first),
+    their Allocations are revoked and those requests are queued again.
+    """
+
+    def __init__(self, optimizer, workers=None):
+        self.optimizer = optimizer
+        self.workers = workers or os.cpu_count() or 1
+        self._queues = {tier: [] for tier in range(len(URGENCY_TIERS))}
+        self._held = {}
+        self._condition = threading.Condition()
+        self._sequence = itertools.count()
+        self._threads = []
+        self._running = False
+
+    def start(self):
+        """
+        Start the worker pool. Routing then reads background weight snapshots instead of refreshing per request.
+        """
+        self.optimizer.start_weight_refresher()
+        with self._condition:
+            self._running = True
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, request_id, hospital, demand, urgency='routine', last_date=None):
+        """
+        Queue a request ({blood_type: units} demand). Returns its ScheduledRequest.
+        """
+        if urgency not in URGENCY_TIERS:
+            raise ValueError(f"Unknown urgency {urgency}, expected one of {URGENCY_TIERS}.")
+        request = ScheduledRequest(request_id, hospital, demand, urgency, parse_deadline(last_date))
+        self._enqueue(request)
+        return request
+
+    def submit_requirement(self, request_id, requirement, urgency='routine'):
+        """
+        Queue a requirement document as stored in Firestore (demand, hospital reference, lastDate).
+        """
+        hospital = requirement['hospital']
+        hospital_id = getattr(hospital, 'id', hospital)
+        return self.submit(request_id, hospital_id, requirement.get('demand', {}), urgency, requirement.get('lastDate'))
+
+    def confirm(self, request_id):
+        """
+        Commit the units held for a lower-tier request. Returns False if it holds nothing (e.g. it was
+        preempted) or if some of its holds had already expired.
+        """
+        with self._condition:
+            entry = self._held.pop(request_id, None)
+        if entry is None:
+            return False
+        committed = [
+            self.optimizer.inventory.commit(reservation)
+            for pickup in entry[1].pickups for reservation in pickup['reservations']
+        ]
+        return all(committed)
+
+    def release(self, request_id):
+        """
+        Give back the units held for a lower-tier request.
+        """
+        with self._condition:
+            entry = self._held.pop(request_id, None)
+        if entry is None:
+            return False
+        self._release_pickups(entry[1].pickups)
+        return True
+
+    def pending(self):
+        with self._condition:
+            return {URGENCY_TIERS[tier]: len(queue) for tier, queue in self._queues.items()}
+
+    def _enqueue(self, request):
+        with self._condition:
+            heapq.heappush(self._queues[request.tier], (request.deadline, next(self._sequence), request))
+            self._condition.notify()
+
+    def _next(self):
+        with self._condition:
+            while self._running:
+                for tier in range(len(URGENCY_TIERS)):
+                    if self._queues[tier]:
+                        return heapq.heappop(self._queues[tier])[2]
+                self._condition.wait()
+            return None
+
+    def _work(self):
+        while True:
+            request = self._next()
+            if request is None:
+                return
+            try:
+                request.future.set_result(self._serve(request))
+            except Exception as e:
+                logging.error(f"Error serving request {request.request_id}: {e}")
+                request.future.set_exception(e)
+
+    def _serve(self, request):
+        commit = request.tier == 0
+        pickups, shortfall = self.optimizer.process_multi_request(request.hospital, request.demand, commit=commit)
+
+        if shortfall and commit and self._preempt(request.tier, shortfall):
+            more_pickups, shortfall = self.optimizer.process_multi_request(request.hospital, shortfall, commit=True)
+            pickups = pickups + more_pickups
+
+        allocation = Allocation(pickups, shortfall)
+        if not commit and pickups:
+            with self._condition:
+                self._held[request.request_id] = (request, allocation)
+        return allocation
+
+    def _preempt(self, tier, shortfall):
+        """
+        Release lower-tier holds covering the missing blood types and queue those requests again.
+        """
+        needed = dict(shortfall)
+        victims = []
+        with self._condition:
+            held = sorted(self._held.values(), key=lambda entry: (-entry[0].tier, -entry[0].deadline))
+            for request, allocation in held:
+                if not needed:
+                    break
+                if request.tier <= tier or not any(t in needed for p in allocation.pickups for t in p['units']):
+                    continue
+                del self._held[request.request_id]
+                victims.append((request, allocation))
+                for pickup in allocation.pickups:
+                    for blood_type, units in pickup['units'].items():
+                        if blood_type in needed:
+                            needed[blood_type] -= units
+                            if needed[blood_type] <= 0:
+                                del needed[blood_type]
+
+        for request, allocation in victims:
+            self._release_pickups(allocation.pickups)
+            logging.info(f"Preempted request {request.request_id} ({request.urgency}) for a tier {tier} request")
+            request.preemptions += 1
+            request.future = Future()
+            allocation.revoke()
+            self._enqueue(request)
+        return bool(victims)
+
+    def _release_pickups(self, pickups):
+        for pickup in pickups:
+            for reservation in pickup['reservations']:
+                self.optimizer.inventory.release(reservation)
@@ -1,47 +1,14 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
-import random
-from faker import Faker
+import numpy as np
 
-# Initialize Firebase
-cred = credentials.Certificate("/home/anirudh/Blood_reaper/blood-reaper-f7580-firebase-adminsdk-dwyff-21dae7f7ea.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+from bulk_seed import FirestoreSink, generate_labs
+from data_sources import FirestoreSource
 
-# Initialize Faker for generating fake data
-fake = Faker()
+if __name__ == '__main__':
+    # Firebase is initialized on the first write
+    db = FirestoreSource()
 
-# Function to generate random GeoPoint coordinates near Kolkata
-def random_location():
-    base_lat = 22.5726
-    base_lon = 88.3639
-    lat_variation = random.uniform(-0.1, 0.1)
-    lon_variation = random.uniform(-0.1, 0.1)
-    return firestore.GeoPoint(base_lat + lat_variation, base_lon + lon_variation)
+    # Generate lab entries in one vectorized batch and write them with batched commits
+    num_entries = 10  # Number of lab entries to generate
+    written = FirestoreSink(db).write("labs", generate_labs(num_entries, np.random.default_rng()))
 
-# Function to generate a random lab entry
-def generate_lab_entry():
-    return {
-        "name": fake.company(),
-        "email": fake.email(),
-        "phone": fake.phone_number(),
-        "location": random_location(),
-        "blood_inventory": {
-            "AB+": str(random.randint(0, 100)),
-            "AB-": str(random.randint(0, 100)),
-            "A+": str(random.randint(0, 100)),
-            "A-": str(random.randint(0, 100)),
-            "B+": str(random.randint(0, 100)),
-            "B-": str(random.randint(0, 100)),
-            "O+": str(random.randint(0, 100)),
-            "O-": str(random.randint(0, 100))
-        }
-    }
-
-# Generate and add multiple lab entries
-num_entries = 10  # Number of lab entries to generate
-for _ in range(num_entries):
-    lab_entry = generate_lab_entry()
-    db.collection("labs").add(lab_entry)
-
-print(f"Added {num_entries} lab entries to Firestore.")
+    print(f"Added {written} lab entries to Firestore.")
@@ -1,44 +1,16 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
-from datetime import datetime, timedelta
-import random
+import numpy as np
 
-# Initialize Firebase app
-cred = credentials.Certificate('/home/anirudh/Blood_reaper/blood-reaper-f7580-firebase-adminsdk-dwyff-21dae7f7ea.json')
-firebase_admin.initialize_app(cred)
+from bulk_seed import FirestoreSink, generate_requirements
+from data_sources import FirestoreSource
 
-# Get Firestore database instance
-db = firestore.client()
+if __name__ == '__main__':
+    # Firebase is initialized on the first write
+    db = FirestoreSource()
 
-# Reference to the hospital
-hospital_ref = db.collection('hospitals').document('5OqTT5Jzr8q1krmJVEzJ')
+    # Hospital the requirements are posted by
+    hospital_id = '5OqTT5Jzr8q1krmJVEzJ'
 
-# Function to generate random blood demands
-def generate_random_demand():
-    blood_types = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
-    demand = {bt: random.randint(5, 30) for bt in random.sample(blood_types, k=random.randint(2, 4))}
-    return demand
+    # Generate 3 new requirements with random demands and write them in one batch
+    FirestoreSink(db).write('requirements', generate_requirements(3, [hospital_id], np.random.default_rng()))
 
-# Function to create a new requirement document
-def create_requirement():
-    demand = generate_random_demand()
-    now = datetime.now()
-    post_date = now.isoformat()
-    last_date = (now + timedelta(days=random.randint(3, 7))).isoformat()
-
-    requirement_data = {
-        'demand': demand,
-        'hospital': hospital_ref,
-        'lastDate': last_date,
-        'postDate': post_date,
-        'respondants': []
-    }
-
-    # Add to Firestore
-    db.collection('requirements').add(requirement_data)
-
-# Generate and add 3 new requirements
-for _ in range(3):
-    create_requirement()
-
-print("New requirements generated successfully.")
+    print("New requirements generated successfully.")
@@ -0,0 +1,40 @@
+import networkx as nx
+
+from dispatch import plan_batch, solve_transportation
+
+
+def test_fillable_requests_are_not_left_short():
+    # A can use either bank, B only reaches b1: filling both means sending A to its farther bank
+    requests = {'A': ('h1', {'O+': 1}), 'B': ('h2', {'O+': 1})}
+    stock = {'b1': {'O+': 1}, 'b2': {'O+': 1}}
+    costs = {'h1': {'b1': 1, 'b2': 3}, 'h2': {'b1': 10}}
+
+    allocations, shortfall = solve_transportation(requests, stock, costs)
+
+    assert sorted(allocations) == [('A', 'b2', 'O+', 1), ('B', 'b1', 'O+', 1)]
+    assert shortfall == {}
+
+
+def test_shortfall_reports_demand_beyond_stock():
+    requests = {'A': ('h1', {'O+': 3})}
+    stock = {'b1': {'O+': 2}}
+    costs = {'h1': {'b1': 5}}
+
+    allocations, shortfall = solve_transportation(requests, stock, costs)
+
+    assert allocations == [('A', 'b1', 'O+', 2)]
+    assert shortfall == {'A': {'O+': 1}}
+
+
+def test_plan_batch_paths_run_from_hospital_to_bank():
+    graph = nx.Graph()
+    graph.add_weighted_edges_from([('h1', 'x', 1), ('x', 'b1', 2), ('h2', 'b1', 4), ('h3', 'x', 1)])
+    requests = {1: ('h1', {'A+': 1}), 2: ('h2', {'A+': 1}), 3: ('h3', {'A+': 1})}
+    stock = {'b1': {'A+': 3}}
+
+    assignments, shortfall = plan_batch(graph, requests, stock)
+
+    assert shortfall == {}
+    assert assignments[1][0]['path'] == ['h1', 'x', 'b1']
+    assert assignments[1][0]['travel_time'] == 3
+    assert assignments[2][0]['path'] == ['h2', 'b1']
@@ -0,0 +1,85 @@
+import networkx as nx
+import pytest
+
+from csr_graph import CSRGraph
+from edge_weights import EdgeWeightRefresher
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class FakeSession:
+    """
+    Every traffic element takes 10 minutes and every weather cell has a factor of 0.1.
+    """
+
+    def get(self, url, params):
+        if 'lat' in params:
+            return FakeResponse({'weather_factor': 0.1})
+        rows = len(params['origins'].split('|'))
+        columns = len(params['destinations'].split('|'))
+        return FakeResponse({'rows': [{'elements': [{'duration': {'value': 600}}] * columns}] * rows})
+
+
+def road(base_times):
+    graph = nx.Graph()
+    for i in range(len(base_times) + 1):
+        graph.add_node(i, latitude=12.0 + i, longitude=77.0)
+    for i, base_time in enumerate(base_times):
+        graph.add_edge(i, i + 1, base_travel_time=base_time)
+    return graph
+
+
+def test_edge_weight_is_live_minutes_plus_weather():
+    graph = road([5.0, 20.0])
+    refresher = EdgeWeightRefresher('traffic', 'weather', session=FakeSession())
+    refresher.refresh(graph)
+
+    # 10 live minutes over a 5 minute base is a ratio of 2; weather adds 0.1 of the base time
+    assert refresher.traffic_cache.get((0, 1)) == pytest.approx(2.0)
+    assert refresher.edge_weight(graph, 0, 1, 5.0) == pytest.approx(5.0 * (2.0 + 0.1))
+    assert refresher.edge_weight(graph, 1, 2, 20.0) == pytest.approx(20.0 * (0.5 + 0.1))
+
+
+def test_edge_without_data_keeps_its_base_time():
+    graph = road([5.0])
+    refresher = EdgeWeightRefresher('traffic', 'weather', session=FakeSession())
+
+    assert refresher.edge_weight(graph, 0, 1, 5.0) == pytest.approx(5.0)
+
+
+def test_factor_arrays_match_edge_weight():
+    graph = road([5.0, 20.0, 7.5])
+    refresher = EdgeWeightRefresher('traffic', 'weather', session=FakeSession())
+    refresher.refresh(graph)
+    csr = CSRGraph.from_networkx(graph)
+
+    csr.apply_factors(*refresher.factor_arrays(csr))
+
+    expected = [refresher.edge_weight(graph, u, v, base) for (u, v), base in zip(csr.edges(), csr.base.tolist())]
+    assert csr.weights.tolist() == pytest.approx(expected)
+
+
+def test_factor_arrays_follow_fetches_after_binding():
+    graph = road([5.0, 20.0])
+    graph.add_node('unlocated')
+    graph.add_edge(2, 'unlocated', base_travel_time=3.0)
+    refresher = EdgeWeightRefresher('traffic', 'weather', session=FakeSession())
+    csr = CSRGraph.from_networkx(graph)
+
+    traffic, weather = refresher.factor_arrays(csr)
+    assert traffic.tolist() == [1.0, 1.0, 1.0]
+    assert weather.tolist() == [0.0, 0.0, 0.0]
+
+    refresher.refresh(graph)
+    csr.apply_factors(*refresher.factor_arrays(csr))
+
+    assert csr.weights.tolist() == pytest.approx([5.0 * 2.1, 20.0 * 0.6, 3.0])
@@ -0,0 +1,88 @@
+import threading
+
+from scheduler import Allocation, RequestScheduler
+
+
+class FakeInventory:
+    def __init__(self, stock):
+        self.stock = stock
+        self.lock = threading.Lock()
+
+    def take(self, blood_type, units):
+        with self.lock:
+            taken = min(units, self.stock.get(blood_type, 0))
+            self.stock[blood_type] = self.stock.get(blood_type, 0) - taken
+            return taken
+
+    def commit(self, reservation):
+        return True
+
+    def release(self, reservation):
+        blood_type, units = reservation
+        with self.lock:
+            self.stock[blood_type] += units
+
+
+class FakeOptimizer:
+    def __init__(self, stock):
+        self.inventory = FakeInventory(stock)
+
+    def start_weight_refresher(self):
+        pass
+
+    def process_multi_request(self, hospital, demand, commit=False):
+        pickups, shortfall = [], {}
+        for blood_type, units in demand.items():
+            taken = self.inventory.take(blood_type, units)
+            if taken:
+                pickups.append({'bank': 'b1', 'units': {blood_type: taken}, 'reservations': [(blood_type, taken)]})
+            if taken < units:
+                shortfall[blood_type] = units - taken
+        return pickups, shortfall
+
+
+def test_allocation_unpacks_as_pickups_and_shortfall():
+    pickups, shortfall = Allocation(['pickup'], {'O+': 1})
+    assert pickups == ['pickup']
+    assert shortfall == {'O+': 1}
+
+
+def test_preempted_caller_sees_its_allocation_revoked():
+    optimizer = FakeOptimizer({'O+': 2})
+    scheduler = RequestScheduler(optimizer, workers=1)
+    scheduler.start()
+    try:
+        routine = scheduler.submit('r1', 'h1', {'O+': 2})
+        old_future = routine.future
+        allocation = old_future.result(timeout=5)
+        revoked = threading.Event()
+        allocation.on_revoke(lambda _: revoked.set())
+        assert not allocation.revoked
+
+        immediate = scheduler.submit('i1', 'h2', {'O+': 2}, urgency='immediate')
+        pickups, shortfall = immediate.future.result(timeout=5)
+        assert shortfall == {}
+        assert sum(p['units']['O+'] for p in pickups) == 2
+
+        # The caller holding the old future sees the same allocation, now revoked
+        assert revoked.wait(timeout=5)
+        assert old_future.result() is allocation
+        assert allocation.revoked
+        assert not scheduler.confirm('r1')
+
+        # The request was queued again and its new allocation arrives on a fresh future
+        assert routine.future is not old_future
+        assert routine.preemptions == 1
+        pickups, shortfall = routine.future.result(timeout=5)
+        assert pickups == []
+        assert shortfall == {'O+': 2}
+    finally:
+        scheduler.stop()
+
+
+def test_callback_registered_after_revocation_runs_at_once():
+    allocation = Allocation([], {})
+    allocation.revoke()
+    seen = []
+    allocation.on_revoke(seen.append)
+    assert seen == [allocation]
@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+
+import numpy as np
+
+BUCKETS = 96  # quarter hours in a day
+DAY_SECONDS = 24 * 60 * 60
+
+
+def _strip_npz(path):
+    return path[:-len('.npz')] if path.endswith('.npz') else path
+
+
+class TrafficProfiles:
+    """
+    Per-edge time-of-day travel-time profiles, learned from past traffic responses.
+
+    Each observation is the ratio of a measured duration to the edge's base_travel_time, filed
+    under the quarter-hour bucket it was measured in. learn() averages them into a float32
+    (edges x 96) profile array; buckets never observed take the edge's mean, and edges never
+    observed keep a factor of 1. Times are Unix timestamps, bucketed in local time, and travel
+    times are in minutes like base_travel_time.
+    """
+
+    def __init__(self, buckets=BUCKETS, utc_offset=None, time_unit=60):
+        self.buckets = buckets
+        self.bucket_seconds = DAY_SECONDS / buckets
+        self.utc_offset = time.localtime().tm_gmtoff if utc_offset is None else utc_offset
+        self.time_unit = time_unit
+        self.edges = []
+        self.profiles = None
+        self._rows = {}
+        self._sums = np.zeros((0, buckets))
+        self._counts = np.zeros((0, buckets), dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def bucket(self, timestamp):
+        return int(((timestamp + self.utc_offset) % DAY_SECONDS) // self.bucket_seconds)
+
+    def observe(self, u, v, timestamp, factor):
+        """
+        Record one measured duration / base time ratio for edge (u, v) at the given time.
+        """
+        with self._lock:
+            row = self._row(u, v)
+            bucket = self.bucket(timestamp)
+            self._sums[row, bucket] += factor
+            self._counts[row, bucket] += 1
+
+    def learn(self, min_factor=0.1):
+        """
+        Turn the observations into profiles. Factors are floored at min_factor so no edge becomes free.
+        """
+        with self._lock:
+            sums, counts = self._sums[:len(self.edges)].copy(), self._counts[:len(self.edges)].copy()
+        observed = counts > 0
+        means = np.divide(sums, counts, out=np.zeros_like(sums), where=observed)
+        totals = counts.sum(axis=1)
+        edge_means = np.divide(sums.sum(axis=1), totals, out=np.ones(len(totals)), where=totals > 0)
+        profiles = np.where(observed, means, edge_means[:, None])
+        self.profiles = np.maximum(profiles, min_factor).astype(np.float32)
+        return self.profiles
+
+    def factor(self, u, v, timestamp):
+        row = self._rows.get((u, v))
+        if row is None or self.profiles is None or row >= len(self.profiles):
+            return 1.0
+        return float(self.profiles[row, self.bucket(timestamp)])
+
+    def travel_time(self, u, v, base_time, departure):
+        """
+        Minutes to traverse edge (u, v) when entering it at the departure timestamp.
+
+        The factor of each bucket acts as a piecewise-constant speed, so a trip spanning several
+        quarter hours is integrated bucket by bucket. Entering later never means arriving earlier,
+        which keeps time-dependent Dijkstra exact.
+        """
+        row = self._rows.get((u, v))
+        if row is None or self.profiles is None or row >= len(self.profiles):
+            return base_time
+        profile = self.profiles[row]
+
+        remaining = base_time * self.time_unit  # seconds left at a factor of 1
+        now = departure
+        while True:
+            offset = (now + self.utc_offset) % DAY_SECONDS
+            factor = float(profile[int(offset // self.bucket_seconds)])
+            window = self.bucket_seconds - offset % self.bucket_seconds
+            if remaining * factor <= window:
+                now += remaining * factor
+                break
+            remaining -= window / factor
+            now += window
+        return (now - departure) / self.time_unit
+
+    def edge_cost(self, departure):
+        """
+        Edge cost function for routing.time_dependent_targets, for a trip leaving at departure.
+        """
+        def cost(u, v, data, elapsed):
+            return self.travel_time(u, v, data.get('base_travel_time', 1), departure + elapsed * self.time_unit)
+        return cost
+
+    def save(self, path):
+        """
+        Store learned profiles as an .npz array file with a JSON edge list alongside.
+        """
+        if self.profiles is None:
+            self.learn()
+        path = _strip_npz(path)
+        np.savez_compressed(f"{path}.npz", profiles=self.profiles, sums=self._sums, counts=self._counts)
+        with open(f"{path}.edges.json", 'w') as f:
+            json.dump([[u, v] for u, v in self.edges], f)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        profiles = cls(**kwargs)
+        path = _strip_npz(path)
+        with np.load(f"{path}.npz") as arrays:
+            profiles.profiles = arrays['profiles']
+            profiles._sums = arrays['sums']
+            profiles._counts = arrays['counts']
+        with open(f"{path}.edges.json") as f:
+            for u, v in json.load(f):
+                profiles._add_edge(u, v)
+        return profiles
+
+    def _row(self, u, v):
+        row = self._rows.get((u, v))
+        if row is None:
+            row = self._add_edge(u, v)
+            if row >= len(self._sums):
+                capacity = max(16, 2 * len(self._sums))
+                self._sums = np.resize(self._sums, (capacity, self.buckets))
+                self._counts = np.resize(self._counts, (capacity, self.buckets))
+                self._sums[row:] = 0
+                self._counts[row:] = 0
+        return row
+
+    def _add_edge(self, u, v):
+        row = len(self.edges)
+        self.edges.append((u, v))
+        self._rows[(u, v)] = row
+        self._rows[(v, u)] = row
+        return row